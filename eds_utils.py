@@ -30,8 +30,11 @@ except NameError:
     from sets import Set as set
 from types import *
 from time import *
+from StringIO import StringIO
 import os,re
 
+from export_utils import WriteFileAtomically
+
 # Regular expression for finding index section names
 index_model = re.compile('([0-9A-F]{1,4}$)')
 # Regular expression for finding subindex section names
@@ -427,9 +430,14 @@ def WriteFile(filepath, content):
 
 # Function that generate the EDS file content for the current node in the manager
 def GenerateFileContent(Node, filepath):
-    # Dictionary of each index contents
-    indexContents = {}
-    
+    content = StringIO()
+    WriteFileContent(Node, filepath, content)
+    return content.getvalue()
+
+
+# Function that write the EDS file content for the current node in the manager
+# section by section into a file opened
+def WriteFileContent(Node, filepath, cfile):
     # Extract local time
     current_time = localtime()
     # Extract node informations
@@ -441,200 +449,162 @@ def GenerateFileContent(Node, filepath):
     # Retreiving lists of indexes defined
     entries = Node.GetIndexes()
     
-    # Generate FileInfo section
-    fileContent = "[FileInfo]\n"
-    fileContent += "FileName=%s\n"%os.path.split(filepath)[-1]
-    fileContent += "FileVersion=1\n"
-    fileContent += "FileRevision=1\n"
-    fileContent += "EDSVersion=4.0\n"
-    fileContent += "Description=%s\n"%description
-    fileContent += "CreationTime=%s"%strftime("%I:%M", current_time)
-    # %p option of strftime seems not working, then generate AM/PM by hands
-    if strftime("%I", current_time) == strftime("%H", current_time):
-        fileContent += "AM\n"
-    else:
-        fileContent += "PM\n"
-    fileContent += "CreationDate=%s\n"%strftime("%m-%d-%Y", current_time)
-    fileContent += "CreatedBy=CANFestival\n"
-    fileContent += "ModificationTime=%s"%strftime("%I:%M", current_time)
+    # List of entry by type (Mandatory, Optional or Manufacturer
+    mandatories = []
+    optionals = []
+    manufacturers = []
+    
+    # First pass, we add each entry in the right list
+    for entry in entries:
+        # First case, entry is between 0x2000 and 0x5FFF, then it's a manufacturer entry
+        if 0x2000 <= entry <= 0x5FFF:
+            manufacturers.append(entry)
+        # Second case, entry is required, then it's a mandatory entry
+        elif Node.GetEntryInfos(entry)["need"]:
+            mandatories.append(entry)
+        # In any other case, it's an optional entry
+        else:
+            optionals.append(entry)
+    
     # %p option of strftime seems not working, then generate AM/PM by hands
     if strftime("%I", current_time) == strftime("%H", current_time):
-        fileContent += "AM\n"
+        current_time_text = "%sAM"%strftime("%I:%M", current_time)
     else:
-        fileContent += "PM\n"
-    fileContent += "ModificationDate=%s\n"%strftime("%m-%d-%Y", current_time)
-    fileContent += "ModifiedBy=CANFestival\n"
+        current_time_text = "%sPM"%strftime("%I:%M", current_time)
+    
+    # Generate FileInfo section
+    cfile.write("[FileInfo]\n")
+    cfile.write("FileName=%s\n"%os.path.split(filepath)[-1])
+    cfile.write("FileVersion=1\n")
+    cfile.write("FileRevision=1\n")
+    cfile.write("EDSVersion=4.0\n")
+    cfile.write("Description=%s\n"%description)
+    cfile.write("CreationTime=%s\n"%current_time_text)
+    cfile.write("CreationDate=%s\n"%strftime("%m-%d-%Y", current_time))
+    cfile.write("CreatedBy=CANFestival\n")
+    cfile.write("ModificationTime=%s\n"%current_time_text)
+    cfile.write("ModificationDate=%s\n"%strftime("%m-%d-%Y", current_time))
+    cfile.write("ModifiedBy=CANFestival\n")
     
     # Generate DeviceInfo section
-    fileContent += "\n[DeviceInfo]\n"
-    fileContent += "VendorName=CANFestival\n"
+    cfile.write("\n[DeviceInfo]\n")
+    cfile.write("VendorName=CANFestival\n")
     # Use information typed by user in Identity entry
-    fileContent += "VendorNumber=0x%8.8X\n"%Node.GetEntry(0x1018, 1)
-    fileContent += "ProductName=%s\n"%nodename
-    fileContent += "ProductNumber=0x%8.8X\n"%Node.GetEntry(0x1018, 2)
-    fileContent += "RevisionNumber=0x%8.8X\n"%Node.GetEntry(0x1018, 3)
+    cfile.write("VendorNumber=0x%8.8X\n"%Node.GetEntry(0x1018, 1))
+    cfile.write("ProductName=%s\n"%nodename)
+    cfile.write("ProductNumber=0x%8.8X\n"%Node.GetEntry(0x1018, 2))
+    cfile.write("RevisionNumber=0x%8.8X\n"%Node.GetEntry(0x1018, 3))
     # CANFestival support all baudrates as soon as driver choosen support them
-    fileContent += "BaudRate_10=1\n"
-    fileContent += "BaudRate_20=1\n"
-    fileContent += "BaudRate_50=1\n"
-    fileContent += "BaudRate_125=1\n"
-    fileContent += "BaudRate_250=1\n"
-    fileContent += "BaudRate_500=1\n"
-    fileContent += "BaudRate_800=1\n"
-    fileContent += "BaudRate_1000=1\n"
+    cfile.write("BaudRate_10=1\n")
+    cfile.write("BaudRate_20=1\n")
+    cfile.write("BaudRate_50=1\n")
+    cfile.write("BaudRate_125=1\n")
+    cfile.write("BaudRate_250=1\n")
+    cfile.write("BaudRate_500=1\n")
+    cfile.write("BaudRate_800=1\n")
+    cfile.write("BaudRate_1000=1\n")
     # Select BootUp type from the informations given by user
-    fileContent += "SimpleBootUpMaster=%s\n"%BOOL_TRANSLATE[nodetype == "master"]
-    fileContent += "SimpleBootUpSlave=%s\n"%BOOL_TRANSLATE[nodetype == "slave"]
+    cfile.write("SimpleBootUpMaster=%s\n"%BOOL_TRANSLATE[nodetype == "master"])
+    cfile.write("SimpleBootUpSlave=%s\n"%BOOL_TRANSLATE[nodetype == "slave"])
     # CANFestival characteristics
-    fileContent += "Granularity=8\n"
-    fileContent += "DynamicChannelsSupported=0\n"
-    fileContent += "CompactPDO=0\n"
-    fileContent += "GroupMessaging=0\n"
+    cfile.write("Granularity=8\n")
+    cfile.write("DynamicChannelsSupported=0\n")
+    cfile.write("CompactPDO=0\n")
+    cfile.write("GroupMessaging=0\n")
     # Calculate receive and tranmit PDO numbers with the entry available
-    fileContent += "NrOfRXPDO=%d\n"%len([idx for idx in entries if 0x1400 <= idx <= 0x15FF])
-    fileContent += "NrOfTXPDO=%d\n"%len([idx for idx in entries if 0x1800 <= idx <= 0x19FF])
+    cfile.write("NrOfRXPDO=%d\n"%len(list(Node.IterIndexes(0x1400, 0x15FF))))
+    cfile.write("NrOfTXPDO=%d\n"%len(list(Node.IterIndexes(0x1800, 0x19FF))))
     # LSS not supported as soon as DS-302 was not fully implemented
-    fileContent += "LSS_Supported=0\n"
+    cfile.write("LSS_Supported=0\n")
     
     # Generate Dummy Usage section
-    fileContent += "\n[DummyUsage]\n"
-    fileContent += "Dummy0001=0\n"
-    fileContent += "Dummy0002=1\n"
-    fileContent += "Dummy0003=1\n"
-    fileContent += "Dummy0004=1\n"
-    fileContent += "Dummy0005=1\n"
-    fileContent += "Dummy0006=1\n"
-    fileContent += "Dummy0007=1\n"
+    cfile.write("\n[DummyUsage]\n")
+    cfile.write("Dummy0001=0\n")
+    cfile.write("Dummy0002=1\n")
+    cfile.write("Dummy0003=1\n")
+    cfile.write("Dummy0004=1\n")
+    cfile.write("Dummy0005=1\n")
+    cfile.write("Dummy0006=1\n")
+    cfile.write("Dummy0007=1\n")
 
     # Generate Comments section
-    fileContent += "\n[Comments]\n"
-    fileContent += "Lines=0\n"
+    cfile.write("\n[Comments]\n")
+    cfile.write("Lines=0\n")
     
-    # List of entry by type (Mandatory, Optional or Manufacturer
-    mandatories = []
-    optionals = []
-    manufacturers = []
-    
-    # Remove all unused PDO
-##    for entry in entries[:]:
-##        if 0x1600 <= entry < 0x1800 or 0x1A00 <= entry < 0x1C00:
-##            subentry_value = Node.GetEntry(entry, 1)
-##            if subentry_value is None or subentry_value == 0:
-##                entries.remove(entry)
-##                entries.remove(entry - 0x200)
-                
-    # For each entry, we generate the entry section or sections if there is subindexes
-    for entry in entries:
-        # Extract infos and values for the entry
+    # Second pass, we write definition and entries of each list
+    for section, section_entries in [("MandatoryObjects", mandatories), 
+                                     ("OptionalObjects", optionals), 
+                                     ("ManufacturerObjects", manufacturers)]:
+        cfile.write("\n[%s]\n"%section)
+        cfile.write("SupportedObjects=%d\n"%len(section_entries))
+        for idx, entry in enumerate(section_entries):
+            cfile.write("%d=0x%4.4X\n"%(idx + 1, entry))
+        for entry in section_entries:
+            WriteEntrySections(Node, entry, cfile)
+
+
+# Function that write the section of an entry, and the sections of its
+# subindexes if there is any, into a file opened
+def WriteEntrySections(Node, entry, cfile):
+    # Extract values for the entry
+    values = Node.GetEntry(entry, compute = False)
+    # Define section name
+    cfile.write("\n[%X]\n"%entry)
+    # If there is only one value, it's a VAR entry
+    if type(values) != ListType:
+        # Extract the informations of the first subindex
+        subentry_infos = Node.GetSubentryInfos(entry, 0)
+        # Generate EDS informations for the entry
+        cfile.write(GenerateSubentryText(subentry_infos, values))
+    else:
+        # Extract infos for the entry
         entry_infos = Node.GetEntryInfos(entry)
-        values = Node.GetEntry(entry, compute = False)
-        # Define section name
-        text = "\n[%X]\n"%entry
-        # If there is only one value, it's a VAR entry
-        if type(values) != ListType:
-            # Extract the informations of the first subindex
-            subentry_infos = Node.GetSubentryInfos(entry, 0)
-            # Generate EDS informations for the entry
-            text += "ParameterName=%s\n"%subentry_infos["name"]
-            text += "ObjectType=0x7\n"
-            text += "DataType=0x%4.4X\n"%subentry_infos["type"]
-            text += "AccessType=%s\n"%subentry_infos["access"]
-            if subentry_infos["type"] == 1:
-                text += "DefaultValue=%s\n"%BOOL_TRANSLATE[values]
-            else:
-                text += "DefaultValue=%s\n"%values
-            text += "PDOMapping=%s\n"%BOOL_TRANSLATE[subentry_infos["pdo"]]
+        # Generate EDS informations for the entry
+        cfile.write("ParameterName=%s\n"%entry_infos["name"])
+        if entry_infos["struct"] & node.OD_IdenticalSubindexes:
+            cfile.write("ObjectType=0x8\n")
+            # All subindexes except the first have the same informations,
+            # only their name need to be computed
+            identical_infos = Node.GetSubentryInfos(entry, 1, False)
+            entry_number = Node.GetBaseIndex(entry) + 1
         else:
-            # Generate EDS informations for the entry
-            text += "ParameterName=%s\n"%entry_infos["name"]
-            if entry_infos["struct"] & node.OD_IdenticalSubindexes:
-                text += "ObjectType=0x8\n"
+            cfile.write("ObjectType=0x9\n")
+        
+        # Generate EDS informations for subindexes of the entry
+        subtexts = []
+        for subentry, value in enumerate(values):
+            # Extract the informations of each subindex
+            if entry_infos["struct"] & node.OD_IdenticalSubindexes and subentry > 0:
+                subentry_infos = identical_infos.copy()
+                subentry_infos["name"] = node.StringFormat(identical_infos["name"], entry_number, subentry)
             else:
-                text += "ObjectType=0x9\n"
-            
-            # Generate EDS informations for subindexes of the entry in a separate text
-            subtext = ""
-            # Reset number of subindex defined 
-            nb_subentry = 0
-            for subentry, value in enumerate(values):
-                # Extract the informations of each subindex
                 subentry_infos = Node.GetSubentryInfos(entry, subentry)
-                # If entry is not for the compatibility, generate informations for subindex
-                if subentry_infos["name"] != "Compatibility Entry":
-                    subtext += "\n[%Xsub%X]\n"%(entry, subentry)
-                    subtext += "ParameterName=%s\n"%subentry_infos["name"]
-                    subtext += "ObjectType=0x7\n"
-                    subtext += "DataType=0x%4.4X\n"%subentry_infos["type"]
-                    subtext += "AccessType=%s\n"%subentry_infos["access"]
-                    if subentry_infos["type"] == 1:
-                        subtext += "DefaultValue=%s\n"%BOOL_TRANSLATE[value]
-                    else:
-                        subtext += "DefaultValue=%s\n"%value
-                    subtext += "PDOMapping=%s\n"%BOOL_TRANSLATE[subentry_infos["pdo"]]
-                    # Increment number of subindex defined 
-                    nb_subentry += 1
-            # Write number of subindex defined for the entry
-            text += "SubNumber=%d\n"%nb_subentry
-            # Write subindex definitions
-            text += subtext
-        
-        # Then we add the entry in the right list
-        
-        # First case, entry is between 0x2000 and 0x5FFF, then it's a manufacturer entry
-        if 0x2000 <= entry <= 0x5FFF:
-            manufacturers.append(entry)
-        # Second case, entry is required, then it's a mandatory entry
-        elif entry_infos["need"]:
-            mandatories.append(entry)
-        # In any other case, it's an optional entry
-        else:
-            optionals.append(entry)
-        # Save text of the entry in the dictiionary of contents
-        indexContents[entry] = text
-    
-    # Before generate File Content we sort the entry list
-    manufacturers.sort()
-    mandatories.sort()
-    optionals.sort()
-    
-    # Generate Definition of mandatory objects
-    fileContent += "\n[MandatoryObjects]\n"
-    fileContent += "SupportedObjects=%d\n"%len(mandatories)
-    for idx, entry in enumerate(mandatories):
-        fileContent += "%d=0x%4.4X\n"%(idx + 1, entry)
-    # Write mandatory entries
-    for entry in mandatories:
-        fileContent += indexContents[entry]
-    
-    # Generate Definition of optional objects
-    fileContent += "\n[OptionalObjects]\n"
-    fileContent += "SupportedObjects=%d\n"%len(optionals)
-    for idx, entry in enumerate(optionals):
-        fileContent += "%d=0x%4.4X\n"%(idx + 1, entry)
-    # Write optional entries
-    for entry in optionals:
-        fileContent += indexContents[entry]
-
-    # Generate Definition of manufacturer objects
-    fileContent += "\n[ManufacturerObjects]\n"
-    fileContent += "SupportedObjects=%d\n"%len(manufacturers)
-    for idx, entry in enumerate(manufacturers):
-        fileContent += "%d=0x%4.4X\n"%(idx + 1, entry)
-    # Write manufacturer entries
-    for entry in manufacturers:
-        fileContent += indexContents[entry]
-    
-    # Return File Content
-    return fileContent
+            # If entry is not for the compatibility, generate informations for subindex
+            if subentry_infos["name"] != "Compatibility Entry":
+                subtexts.append("\n[%Xsub%X]\n"%(entry, subentry) + GenerateSubentryText(subentry_infos, value))
+        # Write number of subindex defined for the entry
+        cfile.write("SubNumber=%d\n"%len(subtexts))
+        # Write subindex definitions
+        for subtext in subtexts:
+            cfile.write(subtext)
+
+
+# Function that generate the EDS informations of a subindex
+def GenerateSubentryText(subentry_infos, value):
+    if subentry_infos["type"] == 1:
+        default_value = BOOL_TRANSLATE[value]
+    else:
+        default_value = value
+    return ("ParameterName=%s\nObjectType=0x7\nDataType=0x%4.4X\nAccessType=%s\nDefaultValue=%s\nPDOMapping=%s\n"%
+            (subentry_infos["name"], subentry_infos["type"], subentry_infos["access"], 
+             default_value, BOOL_TRANSLATE[subentry_infos["pdo"]]))
 
 
 # Function that generates EDS file from current node edited
 def GenerateEDSFile(filepath, node):
     try:
-        # Generate file content
-        content = GenerateFileContent(node, filepath)
-        # Write file
-        WriteFile(filepath, content)
+        # Write file content in a temporary file replacing filepath when done
+        WriteFileAtomically(filepath, lambda cfile: WriteFileContent(node, filepath, cfile))
         return None
     except ValueError, message:
         return _("Unable to generate EDS file\n%s")%message
@@ -674,7 +644,7 @@ def GenerateNode(filepath, nodeID = 0):
             if os.path.isfile(ProfilePath):
                 try:
                     # Load Profile
-                    execfile(ProfilePath)
+                    Mapping, AddMenuEntries = node.ImportProfile(ProfileName, ProfilePath)
                     Node.SetProfileName(ProfileName)
                     Node.SetProfile(Mapping)
                     Node.SetSpecificMenu(AddMenuEntries)
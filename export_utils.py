@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack. 
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, tempfile
+
+# Ranges of indexes exported in IDS and parameter files, with a flag telling if
+# the save property of the entries in the range is considered
+EXPORT_RANGES = [(0x1000, 0x1029, False), (0x2000, 0x5FFF, True)]
+
+#-------------------------------------------------------------------------------
+#                          Definition of Export Context
+#-------------------------------------------------------------------------------
+
+"""
+Class holding the state of one IDS or parameter file export. Each export
+creates its own context so that several exports can run at the same time.
+
+Currently there are three reasons why an entry will not be exported.
+1. considerSaveProperty is True and the save property itself is False
+2. entry index is not between 0x1000 <= entryIndex <= 0x1029 or 0x2000 <= entryIndex <= 0x5FFF
+3. entries with the name Compatibility Entry will not be exported
+"""
+class ExportContext:
+    
+    def __init__(self):
+        self.ConsiderSaveProperty = True
+    
+    """
+    Iterate on the indexes of Node in the exported ranges, in ascending order.
+    The save property is considered or not according to the range of the index
+    returned
+    """
+    def IterIndexes(self, Node):
+        for first, last, considerSaveProperty in EXPORT_RANGES:
+            for entryIndex in Node.IterIndexes(first, last):
+                self.ConsiderSaveProperty = considerSaveProperty
+                yield entryIndex
+
+#-------------------------------------------------------------------------------
+#                               Writing of Files
+#-------------------------------------------------------------------------------
+
+# Mask of the permissions of the files created, read once since reading it
+# changes it for all the threads
+FILE_MODE_MASK = os.umask(0)
+os.umask(FILE_MODE_MASK)
+
+"""
+Write a file by streaming its content with write, a function called with the
+file opened, into a temporary file of the same directory that replaces filepath
+only once completely written, opened in mode. If write raises an exception, the
+temporary file is removed and filepath keeps its previous content
+"""
+def WriteFileAtomically(filepath, write, mode = "w"):
+    directory, filename = os.path.split(os.path.abspath(filepath))
+    handle, temppath = tempfile.mkstemp(prefix = ".%s."%filename, dir = directory)
+    try:
+        tempfile_obj = os.fdopen(handle, mode)
+        try:
+            write(tempfile_obj)
+        finally:
+            tempfile_obj.close()
+        os.chmod(temppath, 0666 & ~FILE_MODE_MASK)
+        # Windows can't rename a file over an existing one
+        if os.name == "nt" and os.path.exists(filepath):
+            os.remove(filepath)
+        os.rename(temppath, filepath)
+    except:
+        if os.path.exists(temppath):
+            os.remove(temppath)
+        raise
+
+
@@ -132,10 +132,10 @@ def GenerateFileContent(Node, headerfilepath, pointers_dict = {}):
     default_string_size = Node.GetDefaultStringSize()
     
     # Compiling lists of indexes
-    rangelist = [idx for idx in Node.GetIndexes() if 0 <= idx <= 0x260]
-    listIndex = [idx for idx in Node.GetIndexes() if 0x1000 <= idx <= 0xFFFF]
-    communicationlist = [idx for idx in Node.GetIndexes() if 0x1000 <= idx <= 0x11FF]
-    variablelist = [idx for idx in Node.GetIndexes() if 0x2000 <= idx <= 0xBFFF]
+    rangelist = list(Node.IterIndexes(0, 0x260))
+    listIndex = list(Node.IterIndexes(0x1000, 0xFFFF))
+    communicationlist = list(Node.IterIndexes(0x1000, 0x11FF))
+    variablelist = list(Node.IterIndexes(0x2000, 0xBFFF))
 
 #-------------------------------------------------------------------------------
 #                       Declaration of the value range types
@@ -22,13 +22,16 @@
 #Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
 
-from types import ListType
+from types import UnicodeType
+import struct, zlib
 
-# Currently there are three reasons why an entry will not be exported to the xml file.
-# 1. considerSaveProperty is True and the save property itself is False
-# 2. entry index is not between 0x1000 <= entryIndex <= 0x1029 or 0x2000 <= entryIndex <= 0x5FFF
-# 3. entries with the name Compatibility Entry will not be exported
-considerSaveProperty = True
+from export_utils import ExportContext, WriteFileAtomically
+
+# Header of binary parameter images: magic, format version, alignment, number
+# of parameters, size of the data following the header and CRC32 of the data
+PARAMETER_IMAGE_HEADER = "<4sHHIII"
+PARAMETER_IMAGE_MAGIC = "CFPI"
+PARAMETER_IMAGE_VERSION = 1
 
 # Function that write an EDS file after generate it's content
 def WriteFile(filepath, content):
@@ -41,57 +44,59 @@ def WriteFile(filepath, content):
 
 
 # Function that generate the EDS file content for the current node in the manager
-def GenerateFileContent(Node, filepath):
-    global considerSaveProperty
+def GenerateFileContent(Node, filepath, alignment=1):
+    layout = GenerateLayout(Node, alignment)
+    
+    # Return File Content
+    return GenerateLayoutTable(layout)
+
+# Function that generate the table of the parameters offsets from a layout
+def GenerateLayoutTable(layout):
+    return ',\n'.join(['{0x%.4X, 0x%.2X, %d}'%(entryIndex, subIndex, offset)
+                       for entryIndex, subIndex, offset, typeSize, typeIndex in layout])
+
+# Function that compute the layout of the parameters saved, a list of
+# (index, subindex, offset, size, type) with offsets aligned on alignment bytes.
+# Parameter files keep the size of the type of each parameter, binary images
+# (image is True) give each parameter the number of bytes its value needs
+def GenerateLayout(Node, alignment=1, image=False):
+    if alignment < 1:
+        raise ValueError, _("Alignment must be a positive number of bytes")
+    context = ExportContext()
     
-    # Retreiving lists of indexes defined
-    entries = Node.GetIndexes()
-    parameters = []
+    layout = []
     byteAddressOffset = 0
     
     # For each entryIndex, we generate the entryIndex section or sections if there is subindexes
-    for entryIndex in entries:
+    for entryIndex in context.IterIndexes(Node):
         
-        if 0x1000 <= entryIndex <= 0x1029:
-            considerSaveProperty = False
-        elif 0x2000 <= entryIndex <= 0x5FFF:
-            considerSaveProperty = True
-        else:
-            # Ignore all other nodes
-            continue
-        
-        values = Node.GetEntry(entryIndex, compute = False)
-        
-        # If there is only one value, it's a VAR entryIndex
-        if type(values) != ListType:
-            par, byteOffset = ExtractEntryInfos(Node, byteAddressOffset, entryIndex)
-            parameters.append(par)
-            byteAddressOffset += byteOffset
-        else:
-            for subIndex, value in enumerate(values): #DONT REMOVE VALUE, Otherwise this will fail.
-                par, byteOffset = ExtractEntryInfos(Node, byteAddressOffset, entryIndex, subIndex)
-                parameters.append(par)
-                byteAddressOffset += byteOffset
-                
+        # A VAR entryIndex only has subIndex 0
+        for subIndex, value, param_infos in Node.IterEntryValues(entryIndex, compute = False):
+            infos = ExtractEntryInfos(Node, context, entryIndex, subIndex, param_infos)
+            if infos is not None:
+                typeSize, typeIndex = infos
+                if image:
+                    typeSize = GetImageSize(Node, entryIndex, subIndex, typeIndex)
+                byteAddressOffset = AlignOffset(byteAddressOffset, alignment)
+                layout.append((entryIndex, subIndex, byteAddressOffset, typeSize, typeIndex))
+                byteAddressOffset += typeSize
     
-    # Return File Content
-    return ',\n'.join(filter(None, parameters))
+    return layout
 
-def ExtractEntryInfos(Node, byteAddressOffset, entryIndex, subIndex=0):
+def AlignOffset(offset, alignment):
+    return (offset + alignment - 1) / alignment * alignment
+
+def ExtractEntryInfos(Node, context, entryIndex, subIndex, param_infos):
     subentry_infos = Node.GetSubentryInfos(entryIndex, subIndex)
-    param_infos = Node.GetParamsEntry(entryIndex, subIndex) #containing comment
-    if (not considerSaveProperty) or param_infos["save"]:
-        return ReadSubEntryInfosAndAddToXml(Node, byteAddressOffset, entryIndex, subentry_infos, param_infos, subIndex)
-    return None, 0
+    if (not context.ConsiderSaveProperty) or param_infos["save"]:
+        return ReadSubEntryInfos(Node, subentry_infos)
+    return None
 
-def ReadSubEntryInfosAndAddToXml(Node, byteAddressOffset, entryIndex, subEntry, paramEntry, subindex):
-    # If entry is not for the compatibility, generate informations for subindex
+def ReadSubEntryInfos(Node, subEntry):
+    # If entry is not for the compatibility, return size and type of subindex
     if "name" in subEntry and subEntry["name"] != "Compatibility Entry":
-        typeSize = GetType(Node, subEntry)
-        entryComment = GetComment(paramEntry)
-        
-        return '{0x%.4X' %entryIndex + ', 0x%.2X' %subindex + ', %d' %byteAddressOffset + '}', typeSize
-    return None, 0
+        return GetType(Node, subEntry), subEntry.get("type", None)
+    return None
 
 def GetComment(paramEntry):
     entryComment = ""
@@ -107,6 +112,103 @@ def GetType(Node, subEntry):
         typeSize = typeInfo["size"]/8
     return typeSize
 
+#-------------------------------------------------------------------------------
+#                          Binary Parameter Image
+#-------------------------------------------------------------------------------
+
+# Function that compute the number of bytes of a parameter in a binary image.
+# Strings take the default string size of the node, characters of unicode strings
+# taking 2 bytes, or the length of their encoded value if greater, domains take
+# their length and booleans one byte
+def GetImageSize(Node, entryIndex, subIndex, typeIndex):
+    baseIndex = typeIndex
+    if typeIndex is not None and 0xA0 <= typeIndex < 0x100 and Node.IsStringType(typeIndex):
+        baseIndex = Node.GetEntry(typeIndex, 1)
+    if baseIndex in (0x9, 0xA, 0xB, 0xF):
+        value = Node.GetEntry(entryIndex, subIndex)
+    if baseIndex in (0x9, 0xA, 0xB):
+        # Slot is sized in characters, and holds at least the encoded value
+        length = Node.GetDefaultStringSize()
+        if typeIndex != baseIndex:
+            length = max(length, Node.GetEntry(typeIndex, 2))
+        if baseIndex == 0xB:
+            length *= 2
+        return max(length, len(EncodeString(baseIndex, value)))
+    elif baseIndex == 0xF:
+        if len(value) == 0:
+            raise ValueError, _("Domain of 0x%04X subindex 0x%02X is empty and can't be saved")%(entryIndex, subIndex)
+        return len(value)
+    elif baseIndex == 0x1:
+        return 1
+    typeInfos = None
+    if typeIndex is not None:
+        typeInfos = Node.GetEntryInfos(typeIndex)
+    if typeInfos is None or typeInfos["size"] <= 0 or typeInfos["size"] % 8 != 0:
+        raise ValueError, _("Type of 0x%04X subindex 0x%02X can't be saved in a parameter image")%(entryIndex, subIndex)
+    return typeInfos["size"] / 8
+
+# Function that encode the value of a string parameter as stored in an image:
+# UNICODE_STRING in UTF-16, other strings in UTF-8
+def EncodeString(baseIndex, value):
+    if baseIndex == 0xB:
+        if not isinstance(value, UnicodeType):
+            value = str(value).decode("utf-8")
+        return value.encode("utf-16-le")
+    elif isinstance(value, UnicodeType):
+        return value.encode("utf-8")
+    return str(value)
+
+# Function that pack the values of the parameters of a layout in a little-endian
+# binary image preceded by a header
+def GenerateImageContent(Node, layout, alignment=1):
+    if layout:
+        entryIndex, subIndex, offset, typeSize, typeIndex = layout[-1]
+        size = AlignOffset(offset + typeSize, alignment)
+    else:
+        size = 0
+    image = bytearray(size)
+    for entryIndex, subIndex, offset, typeSize, typeIndex in layout:
+        if typeSize > 0:
+            value = Node.GetEntry(entryIndex, subIndex)
+            image[offset:offset + typeSize] = PackValue(Node, entryIndex, subIndex, value, typeSize, typeIndex)
+    data = str(image)
+    header = struct.pack(PARAMETER_IMAGE_HEADER, PARAMETER_IMAGE_MAGIC, PARAMETER_IMAGE_VERSION,
+                         alignment, len(layout), size, zlib.crc32(data) & 0xFFFFFFFF)
+    return header + data
+
+# Function that pack a value on size bytes in little-endian order
+def PackValue(Node, entryIndex, subIndex, value, typeSize, typeIndex):
+    try:
+        if Node.IsStringType(typeIndex):
+            baseIndex = typeIndex
+            if 0xA0 <= typeIndex < 0x100:
+                baseIndex = Node.GetEntry(typeIndex, 1)
+            value = EncodeString(baseIndex, value)
+            if len(value) > typeSize:
+                raise ValueError, _("Value of 0x%04X subindex 0x%02X doesn't fit in %d bytes")%(entryIndex, subIndex, typeSize)
+            return value.ljust(typeSize, "\x00")
+        elif Node.IsRealType(typeIndex):
+            if typeSize == 4:
+                return struct.pack("<f", value)
+            return struct.pack("<d", value)
+        return struct.pack("<Q", int(value) & 0xFFFFFFFFFFFFFFFF)[:typeSize]
+    except (TypeError, struct.error):
+        raise ValueError, _("Value of 0x%04X subindex 0x%02X can't be packed on %d bytes")%(entryIndex, subIndex, typeSize)
+
+# Function that generates a binary parameter image from current node edited and
+# its layout table if tablepath is given
+def GenerateParameterImage(filepath, node, alignment=1, tablepath=None):
+    try:
+        layout = GenerateLayout(node, alignment, True)
+        content = GenerateImageContent(node, layout, alignment)
+        WriteFileAtomically(filepath, lambda cfile: cfile.write(content), "wb")
+        if tablepath is not None:
+            table = GenerateLayoutTable(layout)
+            WriteFileAtomically(tablepath, lambda cfile: cfile.write(table))
+        return None
+    except ValueError, message:
+        return _("Unable to generate parameter image\n%s")%message
+
 # Function that generates EDS file from current node edited
 def GenerateParameterFile(filepath, node):
     try:
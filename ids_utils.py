@@ -22,15 +22,77 @@
 #Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
 
-import xml.etree.ElementTree as ET
-import xml.dom.minidom as minidom
-from types import ListType
+from StringIO import StringIO
+from types import UnicodeType
+from xml.sax.saxutils import escape
 
-# Currently there are three reasons why an entry will not be exported to the xml file.
-# 1. considerSaveProperty is True and the save property itself is False
-# 2. entry index is not between 0x1000 <= entryIndex <= 0x1029 or 0x2000 <= entryIndex <= 0x5FFF
-# 3. entries with the name Compatibility Entry will not be exported
-considerSaveProperty = True
+from export_utils import ExportContext, WriteFileAtomically
+
+# Namespace prefix of the elements and indentation used in IDS files
+IDS_NAMESPACE = "http://www.inovel.de/XMLSchema"
+IDS_INDENT = "\t"
+
+# Entities escaped in text data, in addition to "&", "<" and ">"
+IDS_ENTITIES = {"\"" : "&quot;"}
+
+#-------------------------------------------------------------------------------
+#                             IDS Streaming Writer
+#-------------------------------------------------------------------------------
+
+"""
+Class that writes an indented IDS document element by element. Output is the
+same as the one obtained by pretty printing the document with minidom: text
+only elements are written on a single line, empty elements are self-closing.
+"""
+class IDSWriter:
+    
+    def __init__(self, cfile):
+        self.File = cfile
+        self.Depth = 0
+        # Start tag of the last opened element, written when it gets a child
+        self.Pending = None
+    
+    def WriteText(self, text):
+        if isinstance(text, UnicodeType):
+            text = text.encode("utf-8")
+        self.File.write(text)
+    
+    def Flush(self):
+        if self.Pending is not None:
+            self.File.write(self.Pending + ">\n")
+            self.Pending = None
+    
+    def StartDocument(self):
+        self.File.write("<?xml version=\"1.0\" ?>\n")
+    
+    def StartElement(self, name, attrs=""):
+        self.Flush()
+        self.Pending = "%s<ino:%s%s" % (IDS_INDENT * self.Depth, name, attrs)
+        self.Depth += 1
+    
+    def EndElement(self, name):
+        self.Depth -= 1
+        if self.Pending is not None:
+            self.File.write(self.Pending + "/>\n")
+            self.Pending = None
+        else:
+            self.File.write("%s</ino:%s>\n" % (IDS_INDENT * self.Depth, name))
+    
+    def TextElement(self, name, value):
+        self.Flush()
+        indent = IDS_INDENT * self.Depth
+        if value:
+            # Line ends are normalized as the XML parser of minidom does
+            value = value.replace("\r\n", "\n").replace("\r", "\n")
+            self.File.write("%s<ino:%s>" % (indent, name))
+            self.WriteText(escape(value, IDS_ENTITIES))
+            self.File.write("</ino:%s>\n" % name)
+        else:
+            self.File.write("%s<ino:%s/>\n" % (indent, name))
+
+#-------------------------------------------------------------------------------
+#                             IDS File Generation
+#-------------------------------------------------------------------------------
 
 # Function that write an EDS file after generate it's content
 def WriteFile(filepath, content):
@@ -44,55 +106,53 @@ def WriteFile(filepath, content):
 
 # Function that generate the EDS file content for the current node in the manager
 def GenerateFileContent(Node, filepath):
-    global considerSaveProperty
-    
-    # Retreiving lists of indexes defined
-    entries = Node.GetIndexes()
-    
-    ET.register_namespace('ino',"http://www.inovel.de/XMLSchema")
-    parentNode = ET.Element("{http://www.inovel.de/XMLSchema}IDS")
-    deviceNode = ET.SubElement(parentNode, "{http://www.inovel.de/XMLSchema}Device")
-    communicationParameterNode = ET.SubElement(deviceNode, "{http://www.inovel.de/XMLSchema}CommunicationParameter")
-    processParameterNode = ET.SubElement(deviceNode, "{http://www.inovel.de/XMLSchema}ProcessParameter")
+    cfile = StringIO()
+    WriteFileContent(Node, cfile)
+    # Return File Content
+    return cfile.getvalue()
+
+# Function that write the IDS file content for the current node in the manager
+def WriteFileContent(Node, cfile):
+    context = ExportContext()
+    writer = IDSWriter(cfile)
+    writer.StartDocument()
+    writer.StartElement("IDS", " xmlns:ino=\"%s\"" % IDS_NAMESPACE)
+    writer.StartElement("Device")
+    writer.StartElement("CommunicationParameter")
+    section = "CommunicationParameter"
     
-    # For each entryIndex, we generate the entryIndex section or sections if there is subindexes
-    for entryIndex in entries:
-        paraNode = processParameterNode
-        if 0x1000 <= entryIndex <= 0x1029:
-            paraNode = communicationParameterNode
-            considerSaveProperty = False
-        elif 0x2000 <= entryIndex <= 0x5FFF:
-            paraNode = processParameterNode
-            considerSaveProperty = True
-        else:
-            # Ignore all other nodes
-            continue
-        
-        values = Node.GetEntry(entryIndex, compute = False)
+    # For each entryIndex, we generate the entryIndex section or sections if there is subindexes.
+    # Indexes in the exported ranges are sorted so that all the communication
+    # parameters are written before the process parameters
+    for entryIndex in context.IterIndexes(Node):
+        if entryIndex >= 0x2000 and section == "CommunicationParameter":
+            writer.EndElement(section)
+            section = "ProcessParameter"
+            writer.StartElement(section)
         
-        # If there is only one value, it's a VAR entryIndex
-        if type(values) != ListType:
-            ExtractEntryInfos(Node, paraNode, entryIndex)
-        else:
-            for subIndex, value in enumerate(values): #DONT REMOVE VALUE, Otherwise this will fail.
-                ExtractEntryInfos(Node, paraNode, entryIndex, subIndex)
+        # A VAR entryIndex only has subIndex 0
+        for subIndex, value, param_infos in Node.IterEntryValues(entryIndex, compute = False):
+            ExtractEntryInfos(Node, context, writer, entryIndex, subIndex, param_infos)
     
-    # Return File Content
-    return PrettyPrintNode(parentNode)
-
-def ExtractEntryInfos(Node, paraNode, entryIndex, subIndex=0):
+    writer.EndElement(section)
+    if section == "CommunicationParameter":
+        writer.StartElement("ProcessParameter")
+        writer.EndElement("ProcessParameter")
+    writer.EndElement("Device")
+    writer.EndElement("IDS")
+
+def ExtractEntryInfos(Node, context, writer, entryIndex, subIndex, param_infos):
     subentry_infos = Node.GetSubentryInfos(entryIndex, subIndex)
-    param_infos = Node.GetParamsEntry(entryIndex, subIndex) #containing comment
-    if (not considerSaveProperty) or param_infos["save"]:
-        ReadSubEntryInfosAndAddToXml(Node, paraNode, entryIndex, subentry_infos, param_infos, subIndex)
+    if (not context.ConsiderSaveProperty) or param_infos["save"]:
+        ReadSubEntryInfosAndAddToXml(Node, writer, entryIndex, subentry_infos, param_infos, subIndex)
 
-def ReadSubEntryInfosAndAddToXml(Node, parentNode, entryIndex, subEntry, paramEntry, subindex):
+def ReadSubEntryInfosAndAddToXml(Node, writer, entryIndex, subEntry, paramEntry, subindex):
     # If entry is not for the compatibility, generate informations for subindex
     if "name" in subEntry and subEntry["name"] != "Compatibility Entry":
         typeSize, typeNumber = GetType(Node, subEntry)
         entryComment = GetComment(paramEntry)
         
-        AddParameterItem(parentNode, entryIndex, subindex, 
+        AddParameterItem(writer, entryIndex, subindex, 
                          subEntry["access"], subEntry["name"],
                          entryComment, typeSize, typeNumber)
 
@@ -122,36 +182,26 @@ def GetTypeNumber(typeName):
     else:
         return -1
 
-def AddParameterItem(parentNode, index, subindex, access, description, comment, length, dtype):
-    node = ET.SubElement(parentNode, "{http://www.inovel.de/XMLSchema}ParameterItem")
-    CreateNodeWithValue(node, "{http://www.inovel.de/XMLSchema}Index", "0x%.4X"%index)
-    CreateNodeWithValue(node, "{http://www.inovel.de/XMLSchema}Subindex", "0x%.2X"%subindex)
-    CreateNodeWithValue(node, "{http://www.inovel.de/XMLSchema}Authority", access.upper())
-    CreateNodeWithValue(node, "{http://www.inovel.de/XMLSchema}Security", access.upper())
-    CreateNodeWithValue(node, "{http://www.inovel.de/XMLSchema}Description", description)
-    CreateNodeWithValue(node, "{http://www.inovel.de/XMLSchema}Comment", comment)
-    nodeDataType = ET.SubElement(node, "{http://www.inovel.de/XMLSchema}DataType")
-    CreateNodeWithValue(nodeDataType, "{http://www.inovel.de/XMLSchema}Length", length)
-    CreateNodeWithValue(nodeDataType, "{http://www.inovel.de/XMLSchema}Type", "%d"%dtype)
-    
-
-def CreateNodeWithValue(parentNode, elementName, elementValue):
-    node = ET.SubElement(parentNode, elementName)
-    node.text = elementValue
-    return node
-
-def PrettyPrintNode(node):
-    rough_string = ET.tostring(node, encoding="UTF-8", method="xml") #
-    reparsed = minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="\t")
+def AddParameterItem(writer, index, subindex, access, description, comment, length, dtype):
+    writer.StartElement("ParameterItem")
+    writer.TextElement("Index", "0x%.4X"%index)
+    writer.TextElement("Subindex", "0x%.2X"%subindex)
+    writer.TextElement("Authority", access.upper())
+    writer.TextElement("Security", access.upper())
+    writer.TextElement("Description", description)
+    writer.TextElement("Comment", comment)
+    writer.StartElement("DataType")
+    writer.TextElement("Length", length)
+    writer.TextElement("Type", "%d"%dtype)
+    writer.EndElement("DataType")
+    writer.EndElement("ParameterItem")
 
 # Function that generates EDS file from current node edited
 def GenerateIDSFile(filepath, node):
     try:
-        # Generate file content
-        content = GenerateFileContent(node, filepath)
-        # Write file
-        WriteFile(filepath, content)
+        # Write file content while generating it in a temporary file
+        # replacing filepath when done
+        WriteFileAtomically(filepath, lambda cfile: WriteFileContent(node, cfile))
         return None
     except ValueError, message:
         return _("Unable to generate IDS file\n%s")%message
@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack. 
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+
+from types import ListType
+import math
+
+"""
+Objects of the Object Dictionary containing a COB-ID, as (first index, last
+index, subindex, role) where role tells if the node produces or consumes the
+messages sent with this COB-ID. The role of SYNC and TIME COB-IDs is given by
+their flags
+"""
+COBIDObjects = [(0x1005, 0x1005, 0, "sync"),
+                (0x1012, 0x1012, 0, "time"),
+                (0x1014, 0x1014, 0, "producer"),
+                (0x1200, 0x127F, 1, "consumer"),
+                (0x1200, 0x127F, 2, "producer"),
+                (0x1280, 0x12FF, 1, "producer"),
+                (0x1280, 0x12FF, 2, "consumer"),
+                (0x1400, 0x15FF, 1, "consumer"),
+                (0x1800, 0x19FF, 1, "producer")]
+
+"""
+Return the role of the COB-ID defined in a subindex of an entry, None if it
+doesn't define one
+"""
+def GetCOBIDRole(index, subindex):
+    for first, last, cobid_subindex, role in COBIDObjects:
+        if first <= index <= last and subindex == cobid_subindex:
+            return role
+    return None
+
+"""
+Return the COB-ID used and the resolved role of the node for a value of a COB-ID
+object, None if the COB-ID isn't used. A COB-ID of 0, reserved for NMT, means
+that the object isn't configured
+"""
+def ResolveCOBID(role, value):
+    if not isinstance(value, (int, long)):
+        return None
+    if role == "sync":
+        if value & 0x40000000:
+            role = "producer"
+        else:
+            role = "consumer"
+    elif role == "time":
+        if value & 0x40000000:
+            role = "producer"
+        elif value & 0x80000000:
+            role = "consumer"
+        else:
+            return None
+    elif value & 0x80000000:
+        return None
+    if value & 0x20000000:
+        cobid = value & 0x1FFFFFFF
+    else:
+        cobid = value & 0x7FF
+    if cobid == 0:
+        return None
+    return cobid, role
+
+#-------------------------------------------------------------------------------
+#                          Definition of Network Index
+#-------------------------------------------------------------------------------
+
+"""
+Class indexing the objects of the master and of all the slaves of a node list.
+Values are indexed by (index, subindex) and the nodes using a COB-ID by resolved
+COB-ID, both updated node by node or entry by entry when they are modified.
+"""
+
+class NetworkIndex:
+    
+    def __init__(self, nodelist):
+        self.NodeList = nodelist
+        # Values of objects, {(index, subindex) : {node id : value}}
+        self.Objects = {}
+        # Nodes using a COB-ID, {COB-ID : {(node id, index, subindex) : role}}
+        self.COBIDs = {}
+        # Subindexes indexed for each node, {node id : {index : [subindexes]}}
+        self.NodeEntries = {}
+        # COB-IDs which users or PDO mappings changed since last analysis
+        self.ChangedCOBIDs = set()
+        self.MasterID = None
+        # State of the master in the node manager when it was last indexed
+        self.MasterState = None
+        self.Build()
+    
+    """
+    Index all the nodes of the node list
+    """
+    def Build(self):
+        self.ChangedCOBIDs = set(self.COBIDs.keys())
+        self.Objects = {}
+        self.COBIDs = {}
+        self.NodeEntries = {}
+        self.MasterID = self.NodeList.GetMasterNodeID()
+        self.MasterState = self.NodeList.GetManager().GetCurrentState()
+        self.UpdateNode(self.MasterID)
+        for nodeid in self.NodeList.GetSlaveIDs():
+            self.UpdateNode(nodeid)
+    
+    """
+    Index again the master if it was modified through the node manager, by an
+    edit, an undo or a redo, since it was last indexed. The master node being
+    edited in place, its state is the node with the number of modifications
+    buffered
+    """
+    def Refresh(self):
+        if self.NodeList.GetMasterNodeID() != self.MasterID:
+            self.Build()
+        else:
+            state = self.NodeList.GetManager().GetCurrentState()
+            if state[0] is not self.MasterState[0] or state[1] != self.MasterState[1]:
+                self.RefreshNode(self.MasterID)
+                self.MasterState = state
+    
+    """
+    Return the node with the given node ID in the node list, None if not found
+    """
+    def GetNode(self, nodeid):
+        if nodeid == self.MasterID:
+            return self.NodeList.GetManager().CurrentNode
+        elif nodeid in self.NodeList.SlaveNodes:
+            return self.NodeList.SlaveNodes[nodeid]["Node"]
+        return None
+    
+    """
+    Update the index for all the entries of a node, removing it if it's no longer
+    in the node list
+    """
+    def UpdateNode(self, nodeid):
+        for index in self.NodeEntries.get(nodeid, {}).keys():
+            self.RemoveEntry(nodeid, index)
+        self.NodeEntries.pop(nodeid, None)
+        node = self.GetNode(nodeid)
+        if node is not None:
+            for index in node.GetIndexes():
+                self.AddEntry(nodeid, node, index)
+    
+    """
+    Update the index for the entries of a node which values differ from the ones
+    indexed, so that only the COB-IDs of the entries modified are marked as
+    changed
+    """
+    def RefreshNode(self, nodeid):
+        node = self.GetNode(nodeid)
+        indexes = set(self.NodeEntries.get(nodeid, {}).keys())
+        if node is not None:
+            indexes.update(node.GetIndexes())
+        for index in sorted(indexes):
+            if self.GetIndexedValues(nodeid, index) != self.GetNodeValues(node, index):
+                self.UpdateEntry(nodeid, index)
+    
+    """
+    Return the list of the values of an entry of a node in the index
+    """
+    def GetIndexedValues(self, nodeid, index):
+        return [self.Objects[(index, subindex)][nodeid] for subindex in self.NodeEntries.get(nodeid, {}).get(index, [])]
+    
+    """
+    Return the list of the values of an entry of a node, as indexed
+    """
+    def GetNodeValues(self, node, index):
+        if node is None or not node.IsEntry(index):
+            return []
+        values = node.GetEntry(index)
+        if type(values) != ListType:
+            return [values]
+        return values
+    
+    """
+    Update the index for an entry of a node
+    """
+    def UpdateEntry(self, nodeid, index):
+        self.RemoveEntry(nodeid, index)
+        node = self.GetNode(nodeid)
+        if node is not None and node.IsEntry(index):
+            self.AddEntry(nodeid, node, index)
+    
+    def AddEntry(self, nodeid, node, index):
+        values = node.GetEntry(index)
+        if type(values) == ListType:
+            subindexes = range(len(values))
+        else:
+            values = [values]
+            subindexes = [0]
+        for subindex in subindexes:
+            value = values[subindex]
+            self.Objects.setdefault((index, subindex), {})[nodeid] = value
+            role = GetCOBIDRole(index, subindex)
+            if role is not None:
+                result = ResolveCOBID(role, value)
+                if result is not None:
+                    cobid, role = result
+                    self.COBIDs.setdefault(cobid, {})[(nodeid, index, subindex)] = role
+                    self.ChangedCOBIDs.add(cobid)
+        self.NodeEntries.setdefault(nodeid, {})[index] = subindexes
+        self.MappingChanged(nodeid, index)
+    
+    def RemoveEntry(self, nodeid, index):
+        subindexes = self.NodeEntries.get(nodeid, {}).pop(index, [])
+        for subindex in subindexes:
+            nodes = self.Objects[(index, subindex)]
+            value = nodes.pop(nodeid)
+            if len(nodes) == 0:
+                self.Objects.pop((index, subindex))
+            role = GetCOBIDRole(index, subindex)
+            if role is not None:
+                result = ResolveCOBID(role, value)
+                if result is not None:
+                    users = self.COBIDs[result[0]]
+                    users.pop((nodeid, index, subindex))
+                    if len(users) == 0:
+                        self.COBIDs.pop(result[0])
+                    self.ChangedCOBIDs.add(result[0])
+        if subindexes:
+            self.MappingChanged(nodeid, index)
+    
+    """
+    Mark the COB-ID of a PDO as changed when its mapping entry changes
+    """
+    def MappingChanged(self, nodeid, index):
+        if 0x1600 <= index <= 0x17FF or 0x1A00 <= index <= 0x1BFF:
+            cobid = self.GetPDOCOBID(nodeid, index - 0x200)
+            if cobid is not None:
+                self.ChangedCOBIDs.add(cobid)
+    
+    """
+    Return the COB-ID used by the PDO of a node which communication parameter is
+    defined at index, None if the PDO isn't used
+    """
+    def GetPDOCOBID(self, nodeid, index):
+        value = self.Objects.get((index, 1), {}).get(nodeid, None)
+        if value is not None:
+            result = ResolveCOBID(GetCOBIDRole(index, 1), value)
+            if result is not None:
+                return result[0]
+        return None
+    
+    """
+    Return the number of bits mapped by the PDO of a node which mapping is
+    defined at index, None if the node doesn't define the mapping
+    """
+    def GetPDOMappingLength(self, nodeid, index):
+        number = self.Objects.get((index, 0), {}).get(nodeid, None)
+        if not isinstance(number, (int, long)):
+            return None
+        length = 0
+        for subindex in xrange(1, number + 1):
+            value = self.Objects.get((index, subindex), {}).get(nodeid, 0)
+            if isinstance(value, (int, long)):
+                length += value & 0xFF
+        return length
+    
+    """
+    Return the COB-IDs changed since last call and forget them
+    """
+    def PopChangedCOBIDs(self):
+        changed = self.ChangedCOBIDs
+        self.ChangedCOBIDs = set()
+        return changed
+    
+    """
+    Return the values of an object, {node id : value}, for the nodes defining it
+    """
+    def GetObjectValues(self, index, subindex = 0):
+        return self.Objects.get((index, subindex), {})
+    
+    """
+    Return the nodes defining an object
+    """
+    def GetObjectNodes(self, index, subindex = 0):
+        nodes = self.Objects.get((index, subindex), {}).keys()
+        nodes.sort()
+        return nodes
+    
+    """
+    Return the list of COB-IDs used in the network
+    """
+    def GetCOBIDs(self):
+        cobids = self.COBIDs.keys()
+        cobids.sort()
+        return cobids
+    
+    """
+    Return the objects using a COB-ID as a list of (node id, index, subindex, role)
+    """
+    def GetCOBIDUsers(self, cobid):
+        users = [key + (role,) for key, role in self.COBIDs.get(cobid, {}).iteritems()]
+        users.sort()
+        return users
+
+#-------------------------------------------------------------------------------
+#                          Definition of Network Analyzer
+#-------------------------------------------------------------------------------
+
+"""
+Class checking the COB-IDs used in a network index: COB-IDs produced by several
+objects, RPDOs which COB-ID isn't produced by a TPDO and linked TPDO and RPDO
+which mappings don't have the same length. Problems are kept by COB-ID and only
+the COB-IDs changed in the index since last analysis are checked again.
+"""
+
+class NetworkAnalyzer:
+    
+    def __init__(self, index):
+        self.Index = index
+        # Problems found, {COB-ID : [messages]}
+        self.Problems = {}
+        index.PopChangedCOBIDs()
+        for cobid in index.GetCOBIDs():
+            self.AnalyzeCOBID(cobid)
+    
+    """
+    Check the COB-IDs changed since last analysis, including the ones changed by
+    modifications of the master through the node manager, and return the list
+    of all the problems found in network
+    """
+    def Analyze(self):
+        self.Index.Refresh()
+        for cobid in self.Index.PopChangedCOBIDs():
+            self.AnalyzeCOBID(cobid)
+        return self.GetProblems()
+    
+    def GetProblems(self):
+        cobids = self.Problems.keys()
+        cobids.sort()
+        problems = []
+        for cobid in cobids:
+            problems.extend(self.Problems[cobid])
+        return problems
+    
+    def AnalyzeCOBID(self, cobid):
+        self.Problems.pop(cobid, None)
+        users = self.Index.GetCOBIDUsers(cobid)
+        producers = [(nodeid, index) for nodeid, index, subindex, role in users if role == "producer"]
+        tpdos = [(nodeid, index) for nodeid, index in producers if 0x1800 <= index <= 0x19FF]
+        rpdos = [(nodeid, index) for nodeid, index, subindex, role in users if 0x1400 <= index <= 0x15FF]
+        problems = []
+        if len(producers) > 1:
+            problems.append(_("COB-ID 0x%X is produced by %s")%(cobid, 
+                ", ".join(["node 0x%2.2X (0x%4.4X)"%producer for producer in producers])))
+        for nodeid, index in rpdos:
+            if len(tpdos) == 0:
+                problems.append(_("RPDO 0x%4.4X of node 0x%2.2X receives COB-ID 0x%X produced by no TPDO")%(index, nodeid, cobid))
+            else:
+                rpdo_length = self.Index.GetPDOMappingLength(nodeid, index + 0x200)
+                for tpdo_nodeid, tpdo_index in tpdos:
+                    tpdo_length = self.Index.GetPDOMappingLength(tpdo_nodeid, tpdo_index + 0x200)
+                    if rpdo_length is not None and tpdo_length is not None and rpdo_length != tpdo_length:
+                        problems.append(_("RPDO 0x%4.4X of node 0x%2.2X maps %d bits but TPDO 0x%4.4X of node 0x%2.2X maps %d bits")%\
+                            (index, nodeid, rpdo_length, tpdo_index, tpdo_nodeid, tpdo_length))
+        if problems:
+            self.Problems[cobid] = problems
+
+#-------------------------------------------------------------------------------
+#                          Bus Load and Latency Estimation
+#-------------------------------------------------------------------------------
+
+"""
+Return the number of bits of a CAN data frame carrying length bytes, including
+the worst case number of stuff bits
+"""
+def GetFrameBits(length, extended = False):
+    if extended:
+        return 67 + 8 * length + (54 + 8 * length - 1) / 4
+    return 47 + 8 * length + (34 + 8 * length - 1) / 4
+
+"""
+Return the messages sent periodically on the bus of a network index as a list
+of (COB-ID, number of data bytes, period in seconds, extended, node id, index).
+Period is None for event driven PDOs without inhibit time and event timer.
+PDOs only transmitted on remote request aren't returned
+"""
+def GetBusMessages(index):
+    messages = []
+    # SYNC period of the network, given in microseconds by the SYNC producer
+    sync_period = None
+    for nodeid, value in index.GetObjectValues(0x1005).iteritems():
+        result = ResolveCOBID("sync", value)
+        period = index.GetObjectValues(0x1006).get(nodeid, 0)
+        if result is not None and result[1] == "producer" and period > 0:
+            sync_period = period / 1000000.
+            messages.append((result[0], 0, sync_period, result[0] > 0x7FF, nodeid, 0x1005))
+    # PDOs transmitted by each node
+    for cobid in index.GetCOBIDs():
+        for nodeid, entry, subindex, role in index.GetCOBIDUsers(cobid):
+            if 0x1800 <= entry <= 0x19FF:
+                transmission = index.GetObjectValues(entry, 2).get(nodeid, 255)
+                inhibit = index.GetObjectValues(entry, 3).get(nodeid, 0)
+                timer = index.GetObjectValues(entry, 5).get(nodeid, 0)
+                if transmission in (252, 253):
+                    continue
+                elif transmission <= 240:
+                    if sync_period is not None:
+                        period = sync_period * max(1, transmission)
+                    else:
+                        period = None
+                elif inhibit > 0:
+                    period = inhibit / 10000.
+                elif timer > 0:
+                    period = timer / 1000.
+                else:
+                    period = None
+                bits = index.GetPDOMappingLength(nodeid, entry + 0x200) or 0
+                messages.append((cobid, (bits + 7) / 8, period, cobid > 0x7FF, nodeid, entry))
+    # Heartbeats, given in milliseconds by each producer
+    for nodeid, period in index.GetObjectValues(0x1017).iteritems():
+        if period > 0:
+            messages.append((0x700 + nodeid, 1, period / 1000., False, nodeid, 0x1017))
+    return messages
+
+"""
+Return the load of a CAN bus at bitrate bits per second for each COB-ID of a
+list of messages as returned by GetBusMessages. Messages with no bounded period
+have no load
+"""
+def GetBusLoads(messages, bitrate = 250000):
+    loads = {}
+    for cobid, length, period, extended, nodeid, entry in messages:
+        load = 0.
+        if period is not None and period > 0:
+            load = GetFrameBits(length, extended) / (period * bitrate)
+        loads[cobid] = loads.get(cobid, 0.) + load
+    return loads
+
+"""
+Estimate the load of a CAN bus at bitrate bits per second for a list of messages
+as returned by GetBusMessages. Return a dictionary with the load of each COB-ID,
+the total load, the worst case latency in seconds of each COB-ID (None if it
+can't be bounded) and the COB-IDs with no bounded period
+"""
+def EstimateBusLoad(messages, bitrate = 250000):
+    loads = GetBusLoads(messages, bitrate)
+    frames = [(cobid, GetFrameBits(length, extended) / float(bitrate), period)
+              for cobid, length, period, extended, nodeid, entry in messages]
+    frames.sort()
+    latencies = {}
+    for position, (cobid, duration, period) in enumerate(frames):
+        latency = GetWorstCaseLatency(frames, position, 1. / bitrate)
+        if cobid not in latencies or latency is None:
+            latencies[cobid] = latency
+        elif latencies[cobid] is not None:
+            latencies[cobid] = max(latencies[cobid], latency)
+    unbounded = [cobid for cobid, duration, period in frames if period is None or period <= 0]
+    return {"loads" : loads, "total" : sum(loads.values()),
+            "latencies" : latencies, "unbounded" : unbounded}
+
+"""
+Return the worst case latency of the frame at position in a list of (COB-ID,
+duration, period) sorted by priority: blocking by the longest lower priority
+frame and interference of the higher priority ones. Return None if the latency
+isn't bounded
+"""
+def GetWorstCaseLatency(frames, position, bit_time):
+    cobid, duration, period = frames[position]
+    higher = frames[:position]
+    utilisation = 0.
+    for higher_cobid, higher_duration, higher_period in higher:
+        if higher_period is None or higher_period <= 0:
+            return None
+        utilisation += higher_duration / higher_period
+    if utilisation >= 1:
+        return None
+    blocking = max([0.] + [frame[1] for frame in frames[position + 1:]])
+    queuing = blocking
+    while True:
+        interference = blocking
+        for higher_cobid, higher_duration, higher_period in higher:
+            interference += math.ceil((queuing + bit_time) / higher_period) * higher_duration
+        if interference <= queuing:
+            return queuing + duration
+        queuing = interference
@@ -21,9 +21,9 @@
 #License along with this library; if not, write to the Free Software
 #Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
-import cPickle
+import copy, heapq, bisect
 from types import *
-import re
+import os, re, struct
 
 """
 Dictionary of translation between access symbol and their signification
@@ -38,7 +38,18 @@ CustomisableTypes = [(0x02, 0), (0x03, 0), (0x04, 0), (0x05, 0), (0x06, 0), (0x0
     (0x13, 0), (0x14, 0), (0x15, 0), (0x16, 0), (0x18, 0), (0x19, 0), (0x1A, 0),
     (0x1B, 0)]
 
-DefaultParams = {"comment" : "", "save" : False}
+"""
+Read-only params of an entry. A single instance holds the default params,
+shared by all the entries having no params defined
+"""
+class FrozenParams(dict):
+    
+    def ReadOnly(self, *args, **kwargs):
+        raise TypeError, _("Default params are read-only")
+    
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = ReadOnly
+
+DefaultParams = FrozenParams({"comment" : "", "save" : False})
 
 #-------------------------------------------------------------------------------
 #                      Dictionary Mapping and Organisation
@@ -239,12 +250,9 @@ MappingDictionary = {
 Return the index of the typename given by searching in mappingdictionary 
 """
 def FindTypeIndex(typename, mappingdictionary):
-    testdic = {}
     for index, values in mappingdictionary.iteritems():
-        if index < 0x1000:
-            testdic[values["name"]] = index
-    if typename in testdic:
-        return testdic[typename]
+        if index < 0x1000 and values["name"] == typename:
+            return index
     return None
 
 """
@@ -362,6 +370,35 @@ def FindMapVariableList(mappingdictionary, Node, compute=True):
                         list.append((index, subIndex, infos["size"], computed_name))
     return list
 
+"""
+Pack a list of variables given by (index, subIndex, size in bits, period) into
+the fewest PDOs of maxbits bits, variables of different periods being never
+packed together. Return a list of (period, list of (index, subIndex, size))
+giving the variables mapped in each PDO, sorted by period. Raise ValueError if
+a variable doesn't fit in a PDO
+"""
+def PackMapVariables(variables, maxbits = 64):
+    groups = {}
+    for index, subIndex, size, period in variables:
+        if size > maxbits:
+            raise ValueError, _("Variable at index 0x%04X subindex 0x%02X is %d bits long and doesn't fit in a PDO of %d bits!")%(index, subIndex, size, maxbits)
+        groups.setdefault(period, []).append((size, index, subIndex))
+    pdos = []
+    for period in sorted(groups.keys()):
+        # First fit decreasing: place biggest variables first in the first PDO
+        # having enough bits left
+        bins = []
+        for size, index, subIndex in sorted(groups[period], key = lambda x: (-x[0], x[1], x[2])):
+            for bin in bins:
+                if bin[0] + size <= maxbits:
+                    bin[0] += size
+                    bin[1].append((index, subIndex, size))
+                    break
+            else:
+                bins.append([size, [(index, subIndex, size)]])
+        pdos.extend([(period, bin[1]) for bin in bins])
+    return pdos
+
 """
 Return the list of mandatory indexes defined in mappingdictionary 
 """
@@ -389,6 +426,53 @@ def FindIndex(index, mappingdictionary):
                 return idx
     return None
 
+#-------------------------------------------------------------------------------
+#                         Copy of Node Dictionaries Values
+#-------------------------------------------------------------------------------
+
+"""
+Return a copy of an entry value of the Object Dictionary
+"""
+def CopyEntryValue(value):
+    if type(value) == ListType:
+        return value[:]
+    return value
+
+"""
+Return True if index is the one of a PDO mapping entry
+"""
+def IsPDOMappingIndex(index):
+    return 0x1600 <= index <= 0x17FF or 0x1A00 <= index <= 0x1BFF
+
+"""
+Return the params of a subentry given the params defined for it, the shared
+default params if none are defined
+"""
+def MergeParams(params):
+    if params:
+        result = DefaultParams.copy()
+        result.update(params)
+        return result
+    return DefaultParams
+
+"""
+Return a copy of the params of an entry of the Object Dictionary
+"""
+def CopyParamsValue(params):
+    result = params.copy()
+    for key, value in result.iteritems():
+        if type(value) == DictType:
+            result[key] = value.copy()
+    return result
+
+"""
+Return a copy of an entry of a User Mapping Dictionary
+"""
+def CopyMappingValue(infos):
+    result = infos.copy()
+    result["values"] = [values.copy() for values in infos["values"]]
+    return result
+
 #-------------------------------------------------------------------------------
 #                           Formating Name of an Entry
 #-------------------------------------------------------------------------------
@@ -406,6 +490,60 @@ def StringFormat(text, idx, sub):
     else:
         return text
 
+#-------------------------------------------------------------------------------
+#                         Profiles Shared between Nodes
+#-------------------------------------------------------------------------------
+
+"""
+Dictionary of the profiles already loaded, indexed by profile name. A profile
+mapping is shared by all the nodes using it, so it must never be modified
+"""
+LoadedProfiles = {}
+
+"""
+Dictionary of the paths of the files defining the profiles loaded, indexed by
+profile name, including the profiles shared by nodes loaded from a file
+"""
+ProfileFiles = {}
+
+"""
+Return the path of the file of a profile in the config folder
+"""
+def GetProfilePath(profilename):
+    return os.path.join(os.path.split(__file__)[0], "config", "%s.prf"%profilename)
+
+"""
+Return the mapping and the menu entries defined in a profile file. The file is
+only executed again if it has been modified since it was loaded
+"""
+def ImportProfile(profilename, filepath):
+    filepath = os.path.abspath(filepath)
+    ProfileFiles[profilename] = filepath
+    version = (filepath, os.path.getmtime(filepath))
+    if profilename not in LoadedProfiles or LoadedProfiles[profilename][0] != version:
+        profile_globals = globals().copy()
+        execfile(filepath, profile_globals)
+        LoadedProfiles[profilename] = (version, profile_globals["Mapping"], profile_globals["AddMenuEntries"])
+    version, mapping, menuentries = LoadedProfiles[profilename]
+    return mapping, menuentries[:]
+
+"""
+Return the shared mapping of a profile already loaded if it is identical to
+the mapping given. If the profile wasn't loaded yet, the mapping given becomes
+the shared one. The path of the file defining the profile is recorded if given
+and if no file was recorded for this profile yet
+"""
+def ShareProfile(profilename, mapping, filepath = None):
+    if mapping and filepath is not None and profilename not in ProfileFiles and os.path.isfile(filepath):
+        ProfileFiles[profilename] = os.path.abspath(filepath)
+    if profilename in LoadedProfiles:
+        loaded_mapping = LoadedProfiles[profilename][1]
+        if loaded_mapping == mapping:
+            return loaded_mapping
+    elif mapping:
+        LoadedProfiles[profilename] = (None, mapping, [])
+    return mapping
+
 #-------------------------------------------------------------------------------
 #                          Definition of Node Object
 #-------------------------------------------------------------------------------
@@ -431,6 +569,20 @@ class Node:
         self.ParamsDictionary = {}
         self.DS302 = {}
         self.UserMapping = {}
+        self.MapReverseIndex = None
+        self.FreeIndexes = None
+        self.SortedIndexes = None
+        self.TypeRegistry = None
+    
+    """
+    Return the attributes to save, the reverse index of mapped variables, the
+    free and sorted indexes and the type registry being rebuilt when needed
+    """
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ["MapReverseIndex", "FreeIndexes", "SortedIndexes", "TypeRegistry"]:
+            state.pop(name, None)
+        return state
     
     """
     Return the node name
@@ -506,6 +658,7 @@ class Node:
     """
     def SetProfile(self, profile):
         self.Profile = profile
+        self.ResetTypeRegistry()
     
     """
     Return the default string size
@@ -524,6 +677,7 @@ class Node:
     """
     def SetDS302Profile(self, profile):
         self.DS302 = profile
+        self.ResetTypeRegistry()
     
     """
     Define the DS-302 Profile
@@ -566,12 +720,17 @@ class Node:
         if index not in self.Dictionary:
             if not subIndex:
                 self.Dictionary[index] = value
+                self.UpdateMapReverseIndex(index)
+                self.UpdateSortedIndexes(index)
                 return True
             elif subIndex == 1:
                 self.Dictionary[index] = [value]
+                self.UpdateMapSlot(index, subIndex, None, value)
+                self.UpdateSortedIndexes(index)
                 return True
         elif subIndex > 0 and type(self.Dictionary[index]) == ListType and subIndex == len(self.Dictionary[index]) + 1:
             self.Dictionary[index].append(value)
+            self.UpdateMapSlot(index, subIndex, None, value)
             return True
         return False
 
@@ -583,9 +742,11 @@ class Node:
             if not subIndex:
                 if value != None:
                     self.Dictionary[index] = value
+                    self.UpdateMapReverseIndex(index)
                 return True
             elif type(self.Dictionary[index]) == ListType and 0 < subIndex <= len(self.Dictionary[index]):
                 if value != None:
+                    self.UpdateMapSlot(index, subIndex, self.Dictionary[index][subIndex - 1], value)
                     self.Dictionary[index][subIndex - 1] = value
                 return True
         return False
@@ -625,11 +786,14 @@ class Node:
         if index in self.Dictionary:
             if not subIndex:
                 self.Dictionary.pop(index)
+                self.UpdateMapReverseIndex(index)
+                self.UpdateSortedIndexes(index)
+                self.ReleaseIndex(index)
                 if index in self.ParamsDictionary:
                     self.ParamsDictionary.pop(index)
                 return True
             elif type(self.Dictionary[index]) == ListType and subIndex == len(self.Dictionary[index]):
-                self.Dictionary[index].pop(subIndex - 1)
+                self.UpdateMapSlot(index, subIndex, self.Dictionary[index].pop(subIndex - 1), None)
                 if index in self.ParamsDictionary:
                     if subIndex in self.ParamsDictionary[index]:
                         self.ParamsDictionary[index].pop(subIndex)
@@ -637,6 +801,8 @@ class Node:
                         self.ParamsDictionary.pop(index)
                 if len(self.Dictionary[index]) == 0:
                     self.Dictionary.pop(index)
+                    self.UpdateSortedIndexes(index)
+                    self.ReleaseIndex(index)
                     if index in self.ParamsDictionary:
                         self.ParamsDictionary.pop(index)
                 return True
@@ -652,6 +818,40 @@ class Node:
             return subIndex <= len(self.Dictionary[index])
         return False
     
+    """
+    Return the first index from first to last (with a step of incr) that isn't
+    defined in the Object Dictionary, None if there is none. Each range asked
+    keeps the next index not checked yet and a heap of the free indexes before
+    it, so that indexes are only checked once: indexes added since are discarded
+    when found at the top of the heap and removed indexes are pushed back.
+    """
+    def GetFirstFreeIndex(self, first, last, incr = 1):
+        if getattr(self, "FreeIndexes", None) is None:
+            self.FreeIndexes = {}
+        if (first, last, incr) not in self.FreeIndexes:
+            self.FreeIndexes[(first, last, incr)] = [first, []]
+        state = self.FreeIndexes[(first, last, incr)]
+        free = state[1]
+        while len(free) > 0 and free[0] in self.Dictionary:
+            heapq.heappop(free)
+        if len(free) > 0:
+            return free[0]
+        while state[0] <= last and state[0] in self.Dictionary:
+            state[0] += incr
+        if state[0] <= last:
+            return state[0]
+        return None
+    
+    """
+    Push back an index removed from the Object Dictionary in the free indexes of
+    the ranges containing it, if already checked
+    """
+    def ReleaseIndex(self, index):
+        if getattr(self, "FreeIndexes", None) is not None:
+            for (first, last, incr), state in self.FreeIndexes.iteritems():
+                if first <= index < state[0] and (index - first) % incr == 0:
+                    heapq.heappush(state[1], index)
+    
     """
     Returns the value of the entry asked. If the entry has the value "count", it
     returns the number of subIndex in the entry except the first.
@@ -683,35 +883,39 @@ class Node:
         if not getattr(self, "ParamsDictionary", False):
             self.ParamsDictionary = {}
         if index in self.Dictionary:
+            params = self.ParamsDictionary.get(index, {})
             if subIndex == None:
                 if type(self.Dictionary[index]) == ListType:
-                    if index in self.ParamsDictionary:
-                        result = []
-                        for i in xrange(len(self.Dictionary[index]) + 1):
-                            line = DefaultParams.copy()
-                            if i in self.ParamsDictionary[index]:
-                                line.update(self.ParamsDictionary[index][i])
-                            result.append(line)
-                        return result
-                    else:
-                        return [DefaultParams.copy() for i in xrange(len(self.Dictionary[index]) + 1)]
+                    return [MergeParams(params.get(i)) for i in xrange(len(self.Dictionary[index]) + 1)]
                 else:
-                    result = DefaultParams.copy()
-                    if index in self.ParamsDictionary:
-                        result.update(self.ParamsDictionary[index])
-                    return result
+                    return MergeParams(params)
             elif subIndex == 0 and type(self.Dictionary[index]) != ListType:
-                result = DefaultParams.copy()
-                if index in self.ParamsDictionary:
-                    result.update(self.ParamsDictionary[index])
-                return result
+                return MergeParams(params)
             elif type(self.Dictionary[index]) == ListType and 0 <= subIndex <= len(self.Dictionary[index]):
-                result = DefaultParams.copy()
-                if index in self.ParamsDictionary and subIndex in self.ParamsDictionary[index]:
-                    result.update(self.ParamsDictionary[index][subIndex])
-                return result
+                return MergeParams(params.get(subIndex))
         return None
 
+    """
+    Return the value or the list of values of an entry as stored, not compiled
+    """
+    def GetStoredEntry(self, index):
+        return self.Dictionary[index]
+    
+    """
+    Iterate on the (subIndex, value, params) of all the subentries of an entry,
+    subentries having no params defined sharing the default params
+    """
+    def IterEntryValues(self, index, compute = True):
+        if index in self.Dictionary:
+            params = getattr(self, "ParamsDictionary", {}).get(index, {})
+            values = self.Dictionary[index]
+            if type(values) == ListType:
+                yield 0, len(values), MergeParams(params.get(0))
+                for subIndex, value in enumerate(values):
+                    yield subIndex + 1, self.CompileValue(value, index, compute), MergeParams(params.get(subIndex + 1))
+            else:
+                yield 0, self.CompileValue(values, index, compute), MergeParams(params)
+
     def HasEntryCallbacks(self, index):
         entry_infos = self.GetEntryInfos(index)
         if entry_infos and "callback" in entry_infos:
@@ -735,6 +939,7 @@ class Node:
     Add a new entry in the User Mapping Dictionary
     """
     def AddMappingEntry(self, index, subIndex = None, name = "Undefined", struct = 0, size = None, nbmax = None, default = None, values = None):
+        self.ResetTypeRegistry(index)
         if index not in self.UserMapping:
             if values == None:
                 values = []
@@ -758,6 +963,7 @@ class Node:
     Warning ! Modifies an existing entry in the User Mapping Dictionary. Can't add a new one.
     """
     def SetMappingEntry(self, index, subIndex = None, name = None, struct = None, size = None, nbmax = None, default = None, values = None):
+        self.ResetTypeRegistry(index)
         if index in self.UserMapping:
             if subIndex == None:
                 if name != None:
@@ -825,6 +1031,7 @@ class Node:
     is specified it removes the whole index and subIndexes from the User Mapping Dictionary.
     """
     def RemoveMappingEntry(self, index, subIndex = None):
+        self.ResetTypeRegistry(index)
         if index in self.UserMapping:
             if subIndex == None:
                 self.UserMapping.pop(index)
@@ -834,36 +1041,97 @@ class Node:
                 return True
         return False
 
-    def RemoveMapVariable(self, index, subIndex = None):
-        model = index << 16
-        mask = 0xFFFF << 16
+    """
+    Return the reverse index of the variables mapped in PDO mapping entries. It
+    gives, for each index mapped, the (mapping index, subIndex) slots mapping
+    each of its subindexes. It is built on first call and kept up to date by
+    the entry modifications.
+    """
+    def GetMapReverseIndex(self):
+        if getattr(self, "MapReverseIndex", None) is None:
+            self.MapReverseIndex = {}
+            for index, values in self.Dictionary.iteritems():
+                if IsPDOMappingIndex(index) and type(values) == ListType:
+                    for subIndex, value in enumerate(values):
+                        self.UpdateMapSlot(index, subIndex + 1, None, value)
+        return self.MapReverseIndex
+    
+    """
+    Update the reverse index of mapped variables after the value of a mapping
+    slot changed from oldvalue to newvalue (None if slot was added or removed)
+    """
+    def UpdateMapSlot(self, index, subIndex, oldvalue, newvalue):
+        reverse = getattr(self, "MapReverseIndex", None)
+        if reverse is not None and IsPDOMappingIndex(index):
+            if type(oldvalue) in (IntType, LongType) and oldvalue != 0:
+                slots = reverse.get(oldvalue >> 16, {}).get((oldvalue >> 8) & 0xFF)
+                if slots is not None:
+                    slots.discard((index, subIndex))
+            if type(newvalue) in (IntType, LongType) and newvalue != 0:
+                slots = reverse.setdefault(newvalue >> 16, {}).setdefault((newvalue >> 8) & 0xFF, set())
+                slots.add((index, subIndex))
+    
+    """
+    Invalidate the reverse index of mapped variables after a whole mapping
+    entry was replaced or removed
+    """
+    def UpdateMapReverseIndex(self, index):
+        if IsPDOMappingIndex(index):
+            self.MapReverseIndex = None
+    
+    """
+    Return the (mapping index, subIndex) slots mapping a variable. If subIndex
+    isn't specified, slots mapping any subindex of index are returned
+    """
+    def GetMapSlots(self, index, subIndex = None):
+        subindexes = self.GetMapReverseIndex().get(index, {})
         if subIndex:
-            model += subIndex << 8
-            mask += 0xFF << 8
-        for i in self.Dictionary.iterkeys():
-            if 0x1600 <= i <= 0x17FF or 0x1A00 <= i <= 0x1BFF:
-                for j,value in enumerate(self.Dictionary[i]):
-                    if (value & mask) == model:
-                        self.Dictionary[i][j] = 0
+            return list(subindexes.get(subIndex, []))
+        return [slot for slots in subindexes.itervalues() for slot in slots]
+    
+    def RemoveMapVariable(self, index, subIndex = None):
+        for i, j in self.GetMapSlots(index, subIndex):
+            self.SetEntry(i, j, 0)
     
     def UpdateMapVariable(self, index, subIndex, size):
         model = index << 16
-        mask = 0xFFFF << 16
         if subIndex:
             model += subIndex << 8
-            mask = 0xFF << 8
-        for i in self.Dictionary.iterkeys():
-            if 0x1600 <= i <= 0x17FF or 0x1A00 <= i <= 0x1BFF:
-                for j,value in enumerate(self.Dictionary[i]):
-                    if (value & mask) == model:
-                        self.Dictionary[i][j] = model + size
+        for i, j in self.GetMapSlots(index, subIndex):
+            self.SetEntry(i, j, model + size)
     
+    """
+    Move the entries defined from first to last index (with a step of incr) of
+    offset indexes. Values, params and user mappings of the entries are moved
+    together in one operation.
+    """
+    def RelocateEntries(self, first, last, offset, incr = 1):
+        if not getattr(self, "ParamsDictionary", False):
+            self.ParamsDictionary = {}
+        self.MapReverseIndex = None
+        self.FreeIndexes = None
+        self.SortedIndexes = None
+        for dictionary in [self.Dictionary, self.ParamsDictionary, self.UserMapping]:
+            block = [(idx, dictionary.pop(idx)) for idx in xrange(first, last + 1, incr) if idx in dictionary]
+            dictionary.update([(idx + offset, value) for idx, value in block])
+
+    """
+    Remove the entry at index from a line of entries and move the following
+    entries of the line to fill the gap.
+    """
     def RemoveLine(self, index, max, incr = 1):
-        i = index
-        while i < max and self.IsEntry(i + incr):
-            self.Dictionary[i] = self.Dictionary[i + incr]
-            i += incr
-        self.Dictionary.pop(i)
+        if not getattr(self, "ParamsDictionary", False):
+            self.ParamsDictionary = {}
+        last = index
+        while last < max and last + incr in self.Dictionary:
+            last += incr
+        for dictionary in [self.Dictionary, self.ParamsDictionary, self.UserMapping]:
+            dictionary.pop(index, None)
+        self.UpdateMapReverseIndex(index)
+        self.UpdateSortedIndexes(index)
+        self.ReleaseIndex(index)
+        if last > index:
+            self.RelocateEntries(index + incr, last, -incr, incr)
 
     def RemoveUserType(self, index):
         type = self.GetEntry(index, 1)
@@ -875,18 +1143,58 @@ class Node:
         self.RemoveEntry(index)
 
     """
-    Return a copy of the node
+    Return a copy of the node. Only the dictionaries that are modified by
+    editing the node are copied, profile mappings and scalar values are shared
+    with the copy.
     """
     def Copy(self):
-        return cPickle.loads(cPickle.dumps(self))
+        node = copy.copy(self)
+        node.Dictionary = dict([(index, CopyEntryValue(value)) for index, value in self.Dictionary.iteritems()])
+        node.ParamsDictionary = dict([(index, CopyParamsValue(params)) for index, params in getattr(self, "ParamsDictionary", {}).iteritems()])
+        node.UserMapping = dict([(index, CopyMappingValue(infos)) for index, infos in self.UserMapping.iteritems()])
+        node.SpecificMenu = self.SpecificMenu[:]
+        node.MapReverseIndex = None
+        # Free indexes stay valid for the copy, they are kept for undo and redo
+        if getattr(self, "FreeIndexes", None) is not None:
+            node.FreeIndexes = dict([(key, [position, free[:]]) for key, (position, free) in self.FreeIndexes.iteritems()])
+        node.SortedIndexes = None
+        return node
 
     """
     Return a sorted list of indexes in Object Dictionary
     """
     def GetIndexes(self):
-        listindex = self.Dictionary.keys()
-        listindex.sort()
-        return listindex
+        return self.GetSortedIndexes()[:]
+
+    """
+    Return an iterator on the indexes defined from min to max, in ascending order
+    """
+    def IterIndexes(self, min = 0, max = 0xFFFF):
+        indexes = self.GetSortedIndexes()
+        return iter(indexes[bisect.bisect_left(indexes, min):bisect.bisect_right(indexes, max)])
+
+    """
+    Return the sorted list of the indexes defined. It is built on first call and
+    kept sorted by the entry additions and removals
+    """
+    def GetSortedIndexes(self):
+        if getattr(self, "SortedIndexes", None) is None:
+            self.SortedIndexes = self.Dictionary.keys()
+            self.SortedIndexes.sort()
+        return self.SortedIndexes
+
+    """
+    Update the sorted indexes after index was added or removed
+    """
+    def UpdateSortedIndexes(self, index):
+        indexes = getattr(self, "SortedIndexes", None)
+        if indexes is not None:
+            position = bisect.bisect_left(indexes, index)
+            found = position < len(indexes) and indexes[position] == index
+            if index in self.Dictionary and not found:
+                indexes.insert(position, index)
+            elif index not in self.Dictionary and found:
+                indexes.pop(position)
 
     """
     Print the Dictionary values
@@ -896,30 +1204,20 @@ class Node:
     
     def PrintString(self):
         result = ""
-        listindex = self.Dictionary.keys()
-        listindex.sort()
-        for index in listindex:
+        for index in self.IterIndexes():
             name = self.GetEntryName(index)
-            values = self.Dictionary[index]
+            values = self.GetStoredEntry(index)
             if isinstance(values, ListType):
                 result += "%04X (%s):\n"%(index, name)
                 for subidx, value in enumerate(values):
                     subentry_infos = self.GetSubentryInfos(index, subidx + 1)
                     if index == 0x1F22 and value:
-                        nb_params = BE_to_LE(value[:4])
-                        data = value[4:]
-                        value = "%d arg defined"%nb_params
-                        i = 0
-                        count = 1
-                        while i < len(data):
-                            value += "\n%04X %02X, arg %d: "%(index, subidx+1, count)
-                            value += "%04X"%BE_to_LE(data[i:i+2])
-                            value += " %02X"%BE_to_LE(data[i+2:i+3])
-                            size = BE_to_LE(data[i+3:i+7])
-                            value += " %08X"%size
-                            value += (" %0"+"%d"%(size * 2)+"X")%BE_to_LE(data[i+7:i+7+size])
-                            i += 7 + size
-                            count += 1
+                        dcf = ConciseDCF(value)
+                        value = "%d arg defined"%len(dcf)
+                        for count, (dcf_index, dcf_subindex, size, dcf_value) in enumerate(dcf.GetParameters()):
+                            value += "\n%04X %02X, arg %d: "%(index, subidx+1, count + 1)
+                            value += "%04X %02X %08X"%(dcf_index, dcf_subindex, size)
+                            value += (" %0"+"%d"%(size * 2)+"X")%dcf_value
                     elif isinstance(value, IntType):
                         value = "%X"%value
                     result += "%04X %02X (%s): %s\n"%(index, subidx+1, subentry_infos["name"], value)
@@ -929,13 +1227,15 @@ class Node:
                 result += "%04X (%s): %s\n"%(index, name, values)
         return result
             
-    def CompileValue(self, value, index, compute = True):
+    def CompileValue(self, value, index, compute = True, nodeid = None):
         if isinstance(value, (StringType, UnicodeType)) and value.upper().find("$NODEID") != -1:
             base = self.GetBaseIndex(index)
+            if nodeid is None:
+                nodeid = self.ID
             try:
                 raw = eval(value)
                 if compute:
-                    return eval(raw.upper().replace("$NODEID","self.ID"))
+                    return eval(raw.upper().replace("$NODEID","nodeid"))
                 return raw
             except:
                 return 0
@@ -1004,38 +1304,45 @@ class Node:
             return r301
         return result
     
+    """
+    Return the registry of the types known by the node: standard, profile,
+    DS-302 and user types. It is built on first call and reset when a mapping
+    defining types is modified.
+    """
+    def GetTypeRegistry(self):
+        if getattr(self, "TypeRegistry", None) is None:
+            registry = {"index" : {}, "name" : {}, "default" : {}}
+            names = []
+            # Mappings are walked from the lowest priority so that types of the
+            # profile override the ones of DS-302, user and standard mappings
+            for mapping in [MappingDictionary] + self.GetMappings()[::-1]:
+                for index, values in mapping.iteritems():
+                    if index < 0x1000:
+                        registry["index"][values["name"]] = index
+                        registry["name"][index] = values["name"]
+                        if "default" in values:
+                            registry["default"][index] = values["default"]
+                        names.append(values["name"])
+            names.sort()
+            registry["list"] = ",".join(names)
+            self.TypeRegistry = registry
+        return self.TypeRegistry
+    
+    """
+    Reset the type registry if the mapping modified at index defines a type
+    """
+    def ResetTypeRegistry(self, index = 0):
+        if index < 0x1000:
+            self.TypeRegistry = None
+    
     def GetTypeIndex(self, typename):
-        result = None
-        mappings = self.GetMappings()
-        i = 0
-        while not result and i < len(mappings):
-            result = FindTypeIndex(typename, mappings[i])
-            i += 1
-        if result == None:
-            result = FindTypeIndex(typename, MappingDictionary)
-        return result
+        return self.GetTypeRegistry()["index"].get(typename, None)
     
     def GetTypeName(self, typeindex):
-        result = None
-        mappings = self.GetMappings()
-        i = 0
-        while not result and i < len(mappings):
-            result = FindTypeName(typeindex, mappings[i])
-            i += 1
-        if result == None:
-            result = FindTypeName(typeindex, MappingDictionary)
-        return result
+        return self.GetTypeRegistry()["name"].get(typeindex, None)
     
     def GetTypeDefaultValue(self, typeindex):
-        result = None
-        mappings = self.GetMappings()
-        i = 0
-        while not result and i < len(mappings):
-            result = FindTypeDefaultValue(typeindex, mappings[i])
-            i += 1
-        if result == None:
-            result = FindTypeDefaultValue(typeindex, MappingDictionary)
-        return result
+        return self.GetTypeRegistry()["default"].get(typeindex, None)
     
     def GetMapVariableList(self, compute=True):
         list = FindMapVariableList(MappingDictionary, self, compute)
@@ -1084,11 +1391,7 @@ class Node:
 #-------------------------------------------------------------------------------
     
     def GetTypeList(self):
-        list = FindTypeList(MappingDictionary)
-        for mapping in self.GetMappings():
-            list.extend(FindTypeList(mapping))
-        list.sort()
-        return ",".join(list)
+        return self.GetTypeRegistry()["list"]
 
     def GenerateMapName(self, name, index, subindex):
         return "%s (0x%4.4X)" % (name, index)
@@ -1134,28 +1437,240 @@ class Node:
         list = [_("None")] + [self.GenerateMapName(name, index, subIndex) for index, subIndex, size, name in self.GetMapVariableList()]
         return ",".join(list)
 
-def BE_to_LE(value):
+"""
+Class giving the view of a node for one slave of a network. The node, shared by
+all the slaves using the same EDS, is never modified: the view binds the slave
+node ID used to compute the values and stores the values overridden for this
+slave only. Only the node methods reading informations are available: those
+not depending on the values are called on the shared node, the others on the
+view so that they read its values. Methods modifying the node raise TypeError.
+"""
+
+class SlaveView:
+    
+    # Node methods reading informations not depending on entry values
+    SharedMethods = set(["GetNodeName", "GetNodeType", "GetNodeDescription",
+        "GetProfileName", "GetProfile", "GetDefaultStringSize", "GetDS302Profile",
+        "GetSpecificMenu", "GetMappings", "IsEntry", "GetParamsEntry",
+        "HasEntryCallbacks", "IsMappingEntry", "GetIndexes", "IterIndexes",
+        "GetSortedIndexes", "GetBaseIndex", "GetEntryName", "GetEntryInfos",
+        "GetSubentryInfos", "GetTypeRegistry", "GetTypeIndex", "GetTypeName",
+        "GetTypeDefaultValue", "GetMandatoryIndexes", "GetCustomisableTypes",
+        "IsStringType", "IsRealType", "GetTypeList", "GenerateMapName"])
+    
+    # Node methods reading entry values, called on the view
+    ViewMethods = set(["GetCustomisedTypeValues", "GetMapVariableList",
+        "GenerateMapList", "GetMapValue", "GetMapName", "GetMapList", "Print",
+        "PrintString"])
+    
+    def __init__(self, node, id = 0):
+        self.Node = node
+        self.ID = id
+        self.Overrides = {}
+    
+    def __getattr__(self, name):
+        if name in SlaveView.SharedMethods:
+            return getattr(self.Node, name)
+        elif name in SlaveView.ViewMethods:
+            return getattr(Node, name).im_func.__get__(self, SlaveView)
+        elif not name.startswith("__") and hasattr(Node, name):
+            raise TypeError, _("\"%s\" can't be called on a slave, its node is shared by the slaves using the same EDS")%name
+        raise AttributeError, name
+    
     """
-    Convert Big Endian to Little Endian 
-    @param value: value expressed in Big Endian
-    @param size: number of bytes generated
-    @return: a string containing the value converted
+    Return the node shared by the slaves
     """
+    def GetSharedNode(self):
+        return self.Node
+    
+    def GetNodeID(self):
+        return self.ID
+    
+    def SetNodeID(self, id):
+        self.ID = id
     
-    data = [char for char in value]
-    data.reverse()
-    return int("".join(["%2.2X"%ord(char) for char in data]), 16)
+    """
+    Return the overridden values as a dictionary of values by (index, subindex)
+    """
+    def GetOverrides(self):
+        return self.Overrides
+    
+    """
+    Override the value of an entry for this slave only
+    """
+    def SetEntry(self, index, subIndex = None, value = None):
+        if index in self.Node.Dictionary:
+            if not subIndex:
+                # Number of subindexes of an entry can't be overridden
+                if type(self.Node.Dictionary[index]) == ListType:
+                    return False
+                if value != None:
+                    self.Overrides[(index, 0)] = value
+                return True
+            elif type(self.Node.Dictionary[index]) == ListType and 0 < subIndex <= len(self.Node.Dictionary[index]):
+                if value != None:
+                    self.Overrides[(index, subIndex)] = value
+                return True
+        return False
+    
+    """
+    Restore the value of an entry, or of all the subindexes of an entry, defined
+    in shared node
+    """
+    def ResetEntry(self, index, subIndex = None):
+        if subIndex is None:
+            for key in [key for key in self.Overrides if key[0] == index]:
+                self.Overrides.pop(key)
+        else:
+            self.Overrides.pop((index, subIndex), None)
+    
+    def GetEntry(self, index, subIndex = None, compute = True):
+        if index in self.Node.Dictionary:
+            values = self.Node.Dictionary[index]
+            if subIndex == None:
+                if type(values) == ListType:
+                    result = [len(values)]
+                    for i, value in enumerate(values):
+                        result.append(self.CompileValue(self.Overrides.get((index, i + 1), value), index, compute))
+                    return result
+                else:
+                    return self.CompileValue(self.Overrides.get((index, 0), values), index, compute)
+            elif subIndex == 0:
+                if type(values) == ListType:
+                    return len(values)
+                else:
+                    return self.CompileValue(self.Overrides.get((index, 0), values), index, compute)
+            elif type(values) == ListType and 0 < subIndex <= len(values):
+                return self.CompileValue(self.Overrides.get((index, subIndex), values[subIndex - 1]), index, compute)
+        return None
+    
+    def GetStoredEntry(self, index):
+        values = self.Node.Dictionary[index]
+        if type(values) == ListType:
+            return [self.Overrides.get((index, i + 1), value) for i, value in enumerate(values)]
+        return self.Overrides.get((index, 0), values)
+    
+    def IterEntryValues(self, index, compute = True):
+        for subIndex, value, params in self.Node.IterEntryValues(index, False):
+            value = self.Overrides.get((index, subIndex), value)
+            yield subIndex, self.CompileValue(value, index, compute), params
+    
+    def CompileValue(self, value, index, compute = True):
+        return self.Node.CompileValue(value, index, compute, self.ID)
+
+#-------------------------------------------------------------------------------
+#                          Concise DCF Values Encoding
+#-------------------------------------------------------------------------------
+
+# Formats of the parameter header and of the values packed by struct
+DCF_COUNT_FORMAT = "<I"
+DCF_PARAMETER_FORMAT = "<HBI"
+DCF_PARAMETER_SIZE = struct.calcsize(DCF_PARAMETER_FORMAT)
+DCF_VALUE_FORMATS = {1 : "<B", 2 : "<H", 4 : "<I", 8 : "<Q"}
 
-def LE_to_BE(value, size):
+def EncodeDCFValue(value, size):
     """
-    Convert Little Endian to Big Endian
+    Convert an integer to the little endian string stored in a Concise DCF
     @param value: value expressed in integer
     @param size: number of bytes generated
     @return: a string containing the value converted
     """
-    
-    data = ("%" + str(size * 2) + "." + str(size * 2) + "X") % value
-    list_car = [data[i:i+2] for i in xrange(0, len(data), 2)]
-    list_car.reverse()
-    return "".join([chr(int(car, 16)) for car in list_car])
+    value &= (1 << (size * 8)) - 1
+    if size in DCF_VALUE_FORMATS:
+        return struct.pack(DCF_VALUE_FORMATS[size], value)
+    elif size == 0:
+        return ""
+    data = ("%0" + str(size * 2) + "X") % value
+    return data.decode("hex_codec")[::-1]
 
+def DecodeDCFValue(data):
+    """
+    Convert a little endian string stored in a Concise DCF to an integer
+    @param data: string containing the value
+    @return: the value expressed in integer
+    """
+    if len(data) in DCF_VALUE_FORMATS:
+        return struct.unpack(DCF_VALUE_FORMATS[len(data)], data)[0]
+    elif data == "":
+        return 0
+    return int(data[::-1].encode("hex_codec"), 16)
+
+"""
+Class implementing the Concise DCF stored in the subindexes of entry 0x1F22, a
+number of parameters followed by the index, subindex, size and value of each
+parameter. Parameters are only decoded when asked, and appended parameters are
+only serialized with the others when the Concise DCF data is asked.
+"""
+class ConciseDCF:
+    
+    """
+    Constructor initialising the Concise DCF from the data stored in the node
+    """
+    def __init__(self, data = ""):
+        if len(data) >= 4:
+            self.Count = struct.unpack(DCF_COUNT_FORMAT, data[:4])[0]
+            self.Body = data[4:]
+        else:
+            self.Count = 0
+            self.Body = ""
+        self.Pending = []
+        self.Parameters = None
+        self.Data = data
+    
+    def __len__(self):
+        return self.Count
+    
+    """
+    Return the list of parameters as (index, subindex, size, value) tuples
+    """
+    def GetParameters(self):
+        if self.Parameters is None:
+            self.Flush()
+            self.Parameters = []
+            body = self.Body
+            offset = 0
+            for i in xrange(self.Count):
+                index, subindex, size = struct.unpack_from(DCF_PARAMETER_FORMAT, body, offset)
+                offset += DCF_PARAMETER_SIZE
+                self.Parameters.append((index, subindex, size, DecodeDCFValue(body[offset:offset + size])))
+                offset += size
+        return self.Parameters
+    
+    """
+    Replace all the parameters by a list of (index, subindex, size, value) tuples
+    """
+    def SetParameters(self, parameters):
+        self.Count = 0
+        self.Body = ""
+        self.Pending = []
+        self.Parameters = []
+        self.Data = None
+        for index, subindex, size, value in parameters:
+            self.Append(index, subindex, size, value)
+    
+    """
+    Append a parameter at the end of the Concise DCF
+    """
+    def Append(self, index, subindex, size, value):
+        self.Pending.append(struct.pack(DCF_PARAMETER_FORMAT, index, subindex, size) + EncodeDCFValue(value, size))
+        if self.Parameters is not None:
+            self.Parameters.append((index, subindex, size, value))
+        self.Count += 1
+        self.Data = None
+    
+    def Flush(self):
+        if self.Pending:
+            self.Body += "".join(self.Pending)
+            self.Pending = []
+    
+    """
+    Return the data to store in the node, empty string if no parameter defined
+    """
+    def GetData(self):
+        if self.Data is None:
+            self.Flush()
+            if self.Count > 0:
+                self.Data = struct.pack(DCF_COUNT_FORMAT, self.Count) + self.Body
+            else:
+                self.Data = ""
+        return self.Data
@@ -161,7 +161,6 @@ class NodeEditorTemplate:
                 if index not in new_profile:
                     removinglist.append(index)
             self.Manager.ManageEntriesOfCurrent(addinglist, removinglist)
-            self.Manager.BufferCurrentNode()
             self.RefreshBufferState()
             
         dialog.Destroy()
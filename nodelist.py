@@ -22,8 +22,9 @@
 #Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
 from node import *
+from network_utils import NetworkIndex, NetworkAnalyzer, GetBusMessages, EstimateBusLoad
 import eds_utils
-import os, shutil, types
+import os, shutil, struct, types
 
 #-------------------------------------------------------------------------------
 #                          Definition of NodeList Object
@@ -43,6 +44,8 @@ class NodeList:
         self.EDSNodes = {}
         self.CurrentSelected = None
         self.Changed = False
+        self.Index = None
+        self.Analyzer = None
     
     def HasChanged(self):
         return self.Changed or not self.Manager.CurrentIsSaved()
@@ -102,6 +105,8 @@ class NodeList:
     def LoadProject(self, root, netname = None):
         self.SlaveNodes = {}
         self.EDSNodes = {}
+        self.Index = None
+        self.Analyzer = None
         
         self.Root = root
         if not os.path.exists(self.Root):
@@ -160,9 +165,10 @@ class NodeList:
     
     def AddSlaveNode(self, nodeName, nodeID, eds):
         if eds in self.EDSNodes.keys():
-            slave = {"Name" : nodeName, "EDS" : eds, "Node" : self.EDSNodes[eds]}
+            slave = {"Name" : nodeName, "EDS" : eds, "Node" : SlaveView(self.EDSNodes[eds], nodeID)}
             self.SlaveNodes[nodeID] = slave
             self.Changed = True
+            self.UpdateNetworkIndex(nodeID)
             return None
         else:
             return _("\"%s\" EDS file is not available")%eds
@@ -171,6 +177,7 @@ class NodeList:
         if index in self.SlaveNodes.keys():
             self.SlaveNodes.pop(index)
             self.Changed = True
+            self.UpdateNetworkIndex(index)
             return None
         else:
             return _("Node with \"0x%2.2X\" ID doesn't exist")
@@ -240,16 +247,64 @@ class NodeList:
     
     def GetSlaveNodeEntry(self, nodeid, index, subindex = None):
         if nodeid in self.SlaveNodes.keys():
-            self.SlaveNodes[nodeid]["Node"].SetNodeID(nodeid)
             return self.SlaveNodes[nodeid]["Node"].GetEntry(index, subindex)
         else:
             return _("Node 0x%2.2X doesn't exist")%nodeid
+    
+    def SetSlaveNodeEntry(self, nodeid, index, subindex = None, value = None):
+        if nodeid in self.SlaveNodes.keys():
+            result = self.SlaveNodes[nodeid]["Node"].SetEntry(index, subindex, value)
+            self.UpdateNetworkIndex(nodeid, index)
+            return result
+        return False
 
     def GetMasterNodeEntry(self, index, subindex = None):
         return self.Manager.GetCurrentEntry(index, subindex)
         
     def SetMasterNodeEntry(self, index, subindex = None, value = None):
         self.Manager.SetCurrentEntry(index, subindex, value)
+        self.UpdateNetworkIndex(self.GetMasterNodeID(), index)
+    
+    """
+    Return the index of the objects and COB-IDs of all the nodes in network,
+    refreshed if the master was modified through the node manager
+    """
+    def GetNetworkIndex(self):
+        if self.Index is None:
+            self.Index = NetworkIndex(self)
+        else:
+            self.Index.Refresh()
+        return self.Index
+    
+    """
+    Return the list of COB-ID and PDO link problems found in network. Only the
+    COB-IDs changed since last call are checked again
+    """
+    def AnalyzeNetwork(self):
+        index = self.GetNetworkIndex()
+        if self.Analyzer is None or self.Analyzer.Index is not index:
+            self.Analyzer = NetworkAnalyzer(index)
+        return self.Analyzer.Analyze()
+    
+    """
+    Estimate the load of the network CAN bus at bitrate bits per second and the
+    worst case latency of each COB-ID, see network_utils.EstimateBusLoad
+    """
+    def EstimateBusLoad(self, bitrate = 250000):
+        return EstimateBusLoad(GetBusMessages(self.GetNetworkIndex()), bitrate)
+    
+    """
+    Update the network index after the modification of a node, or of an entry of
+    a node if index is given
+    """
+    def UpdateNetworkIndex(self, nodeid, index = None):
+        if self.Index is not None:
+            if self.GetMasterNodeID() != self.Index.MasterID:
+                self.Index.Build()
+            elif index is None:
+                self.Index.UpdateNode(nodeid)
+            else:
+                self.Index.UpdateEntry(nodeid, index)
     
     def GetOrderNumber(self, nodeid):
         nodeindexes = self.SlaveNodes.keys()
@@ -271,7 +326,6 @@ class NodeList:
             else:
                 node = self.SlaveNodes[self.CurrentSelected]["Node"]
                 if node:
-                    node.SetNodeID(self.CurrentSelected)
                     return node.IsEntry(index)
         return False
     
@@ -282,7 +336,6 @@ class NodeList:
             else:
                 node = self.SlaveNodes[self.CurrentSelected]["Node"]
                 if node:
-                    node.SetNodeID(self.CurrentSelected)
                     return node.GetEntryInfos(index)
         return None
 
@@ -293,7 +346,6 @@ class NodeList:
             else:
                 node = self.SlaveNodes[self.CurrentSelected]["Node"]
                 if node:
-                    node.SetNodeID(self.CurrentSelected)
                     return node.GetSubentryInfos(index, subindex)
         return None
 
@@ -304,11 +356,9 @@ class NodeList:
             else:
                 node = self.SlaveNodes[self.CurrentSelected]["Node"]
                 if node:
-                    node.SetNodeID(self.CurrentSelected)
                     validindexes = []
-                    for index in node.GetIndexes():
-                        if min <= index <= max:
-                            validindexes.append((node.GetEntryName(index), index))
+                    for index in node.IterIndexes(min, max):
+                        validindexes.append((node.GetEntryName(index), index))
                     return validindexes
                 else:
                     print _("Can't find node")
@@ -318,7 +368,6 @@ class NodeList:
         if self.CurrentSelected != None:
             node = self.SlaveNodes[self.CurrentSelected]["Node"]
             if node:
-                node.SetNodeID(self.CurrentSelected)
                 return self.Manager.GetNodeEntryValues(node, index)
             else:
                 print _("Can't find node")
@@ -326,12 +375,169 @@ class NodeList:
     
     def AddToMasterDCF(self, node_id, index, subindex, size, value):
         # Adding DCF entry into Master node
-        if not self.Manager.IsCurrentEntry(0x1F22):
-            self.Manager.ManageEntriesOfCurrent([0x1F22], [])
-        self.Manager.AddSubentriesToCurrent(0x1F22, 127)
-
-        self.Manager.AddToDCF(node_id, index, subindex, size, value)
+        self.Manager.AddListToDCF({node_id : [(index, subindex, size, value)]})
+        self.UpdateNetworkIndex(self.GetMasterNodeID(), 0x1F22)
+    
+    """
+    Build the Concise DCF of several slaves in master node. Configurations are
+    given in a dictionary of lists of (index, subindex, value) by slave node id,
+    a None value standing for the current value of the slave, the value set for
+    this slave or the one defined in its EDS. Parameters of
+    slaves are computed by the map function of pool if given
+    """
+    def BuildMasterDCF(self, configurations, replace = True, pool = None):
+        parameters = self.ComputeSlavesDCF(configurations, ComputeSlaveDCF, pool)
+        if isinstance(parameters, (types.StringType, types.UnicodeType)):
+            return parameters
+        self.Manager.AddListToDCF(parameters, replace)
+        self.UpdateNetworkIndex(self.GetMasterNodeID(), 0x1F22)
+        return None
     
+    """
+    Build the Concise DCF of several slaves in master node like BuildMasterDCF,
+    keeping only the parameters which values differ from the slave EDS ones.
+    Return a dictionary of (bytes saved, SDO transactions saved) by slave node
+    id or an error message
+    """
+    def OptimizeMasterDCF(self, configurations, replace = True, pool = None):
+        results = self.ComputeSlavesDCF(configurations, ComputeSlaveDeltaDCF, pool)
+        if isinstance(results, (types.StringType, types.UnicodeType)):
+            return results
+        parameters = {}
+        savings = {}
+        for nodeid, (node_parameters, saved_bytes, saved_transactions) in results.iteritems():
+            parameters[nodeid] = node_parameters
+            savings[nodeid] = (saved_bytes, saved_transactions)
+        self.Manager.AddListToDCF(parameters, replace)
+        self.UpdateNetworkIndex(self.GetMasterNodeID(), 0x1F22)
+        return savings
+    
+    def ComputeSlavesDCF(self, configurations, function, pool = None):
+        jobs = []
+        for nodeid, configuration in configurations.iteritems():
+            if nodeid not in self.SlaveNodes:
+                return _("Node 0x%2.2X doesn't exist")%nodeid
+            jobs.append((nodeid, self.SlaveNodes[nodeid]["Node"], configuration))
+        if pool is not None:
+            results = pool.map(function, jobs)
+        else:
+            results = map(function, jobs)
+        parameters = {}
+        for nodeid, result in results:
+            if isinstance(result, (types.StringType, types.UnicodeType)):
+                return result
+            parameters[nodeid] = result
+        return parameters
+
+#-------------------------------------------------------------------------------
+#                          Slave Concise DCF Computation
+#-------------------------------------------------------------------------------
+
+"""
+Compute the Concise DCF parameters of a slave. Job is a tuple of the slave node
+id, the slave node or its view and a list of (index, subindex, value), a None
+value standing for the value set for this slave or the one defined in its EDS.
+Return the node id and the list of (index, subindex, size, value) or an error
+message
+"""
+def ComputeSlaveDCF(job):
+    nodeid, node, configuration = job
+    if not isinstance(node, SlaveView):
+        node = SlaveView(node, nodeid)
+    parameters = []
+    for index, subindex, value in configuration:
+        parameter = GetDCFParameter(node, index, subindex, value)
+        if parameter is None:
+            return nodeid, _("Node 0x%2.2X has no entry 0x%04X subindex 0x%02X")%(nodeid, index, subindex)
+        parameters.append(parameter)
+    return nodeid, parameters
+
+"""
+Compute the Concise DCF parameters of a slave like ComputeSlaveDCF, keeping only
+the last value given for each subindex when it differs from the slave EDS one.
+PDO parameters are all kept since their intermediate values are part of the
+reconfiguration sequence of the PDO. Return the node id and a tuple of the parameters ordered for download, the
+number of bytes and the number of SDO transactions saved, or an error message
+"""
+def ComputeSlaveDeltaDCF(job):
+    nodeid, parameters = ComputeSlaveDCF(job)
+    if isinstance(parameters, (types.StringType, types.UnicodeType)):
+        return nodeid, parameters
+    node = job[1]
+    if isinstance(node, SlaveView):
+        node = node.GetSharedNode()
+    defaults = SlaveView(node, nodeid)
+    delta = []
+    for parameter in OrderDCFParameters(parameters):
+        index, subindex, size, value = parameter
+        if IsPDOParameter(index) or parameter != GetDCFParameter(defaults, index, subindex, None):
+            delta.append(parameter)
+    saved_bytes = 0
+    saved_transactions = 0
+    for dcf_parameters, sign in [(parameters, 1), (delta, -1)]:
+        for index, subindex, size, value in dcf_parameters:
+            saved_bytes += sign * (DCF_PARAMETER_SIZE + size)
+            saved_transactions += sign * GetSDOTransactions(size)
+    return nodeid, (delta, saved_bytes, saved_transactions)
+
+"""
+Return the (index, subindex, size, value) parameter of a slave Concise DCF, the
+current value of the slave view being used if value is None. Return None if the
+entry doesn't exist
+"""
+def GetDCFParameter(node, index, subindex, value):
+    current = node.GetEntry(index, subindex)
+    if current is None:
+        return None
+    if value is None:
+        value = current
+    typeindex = node.GetSubentryInfos(index, subindex)["type"]
+    if node.IsStringType(typeindex):
+        size = len(value)
+        value = DecodeDCFValue(value)
+    elif node.IsRealType(typeindex):
+        size = node.GetEntryInfos(typeindex)["size"] / 8
+        value = DecodeDCFValue(struct.pack({4 : "<f", 8 : "<d"}[size], value))
+    else:
+        size = max(1, node.GetEntryInfos(typeindex)["size"] / 8)
+        value = int(value)
+    return index, subindex, size, value
+
+"""
+Return True if index is a PDO communication or mapping parameter
+"""
+def IsPDOParameter(index):
+    return 0x1400 <= index <= 0x1BFF
+
+"""
+Order the parameters of a Concise DCF for download: only the last parameter
+given for a subindex is kept and entries are configured by increasing index.
+PDO parameters are written afterwards, all of them in the order given, since
+CANopen requires a PDO to be reconfigured by a sequence of writes (invalidate
+the COB ID, clear the number of mapped objects, write the mapping, set the
+number of mapped objects and validate the COB ID again)
+"""
+def OrderDCFParameters(parameters):
+    last = {}
+    pdo_parameters = []
+    for parameter in parameters:
+        if IsPDOParameter(parameter[0]):
+            pdo_parameters.append(parameter)
+        else:
+            last[parameter[:2]] = parameter
+    keys = last.keys()
+    keys.sort()
+    return [last[key] for key in keys] + pdo_parameters
+
+"""
+Return the number of SDO transactions needed for downloading a value of size
+bytes, expedited if it fits in 4 bytes, segmented by 7 bytes otherwise
+"""
+def GetSDOTransactions(size):
+    if size <= 4:
+        return 1
+    return 1 + (size + 6) / 7
+
 if __name__ == "__main__":
     from nodemanager import *
     import os, sys, shutil
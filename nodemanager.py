@@ -27,15 +27,24 @@ setParanoia(0)
 
 from node import *
 import eds_utils, gen_cfile, ids_utils, gen_parfile
+from snapshot_utils import ResolvedNode, NodeSnapshot, PublishNodeSnapshot
 
 from types import *
-import os, re
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import os, re, time
 
 UndoBufferLength = 20
 
 type_model = re.compile('([\_A-Z]*)([0-9]*)')
 range_model = re.compile('([\_A-Z]*)([0-9]*)\[([\-0-9]*)-([\-0-9]*)\]')
 
+# Functions exporting a node to a file, by extension of the file
+ExportFunctions = {".c" : gen_cfile.GenerateFile,
+                   ".eds" : eds_utils.GenerateEDSFile,
+                   ".ids" : ids_utils.GenerateIDSFile,
+                   ".par" : gen_parfile.GenerateParameterFile}
+
 # ID for the file viewed
 CurrentID = 0
 
@@ -157,6 +166,12 @@ class NodeManager:
         self.NodeIndex = None
         self.CurrentNode = None
         self.UndoBuffers = {}
+        self.TransactionLevel = 0
+        self.TransactionChanged = False
+        self.TransactionStates = []
+        # Number of modifications buffered, telling with the current node if
+        # the node edited has changed
+        self.CurrentChanges = 0
 
 #-------------------------------------------------------------------------------
 #                         Type and Map Variable Lists
@@ -211,9 +226,9 @@ class NodeManager:
                     # Charging DS-302 profile if choosen by user
                     if os.path.isfile(DS302Path):
                         try:
-                            execfile(DS302Path)
-                            self.CurrentNode.SetDS302Profile(Mapping)
-                            self.CurrentNode.ExtendSpecificMenu(AddMenuEntries)
+                            mapping, menuentries = ImportProfile("DS-302", DS302Path)
+                            self.CurrentNode.SetDS302Profile(mapping)
+                            self.CurrentNode.ExtendSpecificMenu(menuentries)
                         except:
                             return _("Problem with DS-302! Syntax Error.")
                     else:
@@ -240,10 +255,16 @@ class NodeManager:
             # Add a new buffer 
             index = self.AddNodeBuffer(self.CurrentNode.Copy(), False)
             self.SetCurrentFilePath("")
-            # Add Mandatory indexes
-            self.ManageEntriesOfCurrent(AddIndexList, [])
-            for idx, num in AddSubIndexList:
-                self.AddSubentriesToCurrent(idx, num)
+            # Add Mandatory indexes in a single buffer state
+            self.BeginCurrentTransaction()
+            try:
+                self.ManageEntriesOfCurrent(AddIndexList, [])
+                for idx, num in AddSubIndexList:
+                    self.AddSubentriesToCurrent(idx, num)
+            except:
+                self.CancelCurrentTransaction()
+                raise
+            self.CommitCurrentTransaction()
             return index
         else:
             return result
@@ -255,10 +276,10 @@ class NodeManager:
         if profile != "None":
             # Try to charge the profile given
             try:
-                execfile(filepath)
+                mapping, menuentries = ImportProfile(profile, filepath)
                 node.SetProfileName(profile)
-                node.SetProfile(Mapping)
-                node.SetSpecificMenu(AddMenuEntries)
+                node.SetProfile(mapping)
+                node.SetSpecificMenu(menuentries)
                 return None
             except:
                 return _("Syntax Error\nBad OD Profile file!")
@@ -278,6 +299,9 @@ class NodeManager:
             file = open(filepath, "r")
             node = load(file)
             file.close()
+            # Share profiles with the other nodes that already loaded them
+            node.SetProfile(ShareProfile(node.GetProfileName(), node.GetProfile(), GetProfilePath(node.GetProfileName())))
+            node.SetDS302Profile(ShareProfile("DS-302", node.GetDS302Profile(), GetProfilePath("DS-302")))
             self.CurrentNode = node
             self.CurrentNode.SetNodeID(0)
             # Add a new buffer and defining current state
@@ -366,6 +390,21 @@ class NodeManager:
     """
     def ExportCurrentToParameterFile(self, filepath):
         return gen_parfile.GenerateParameterFile(filepath, self.CurrentNode)
+    
+    """
+    Export current node to several files in one go, the format of each file
+    being given by its extension
+    """
+    def ExportCurrentToFiles(self, filepaths):
+        if self.CurrentNode:
+            return ExportFiles(self.CurrentNode, filepaths)
+    
+    """
+    Export the default values of parameters to a binary image and its layout
+    table if a table path is given
+    """
+    def ExportCurrentToParameterImage(self, filepath, alignment=1, tablepath=None):
+        return gen_parfile.GenerateParameterImage(filepath, self.CurrentNode, alignment, tablepath)
 
 #-------------------------------------------------------------------------------
 #                        Add Entries to Current Functions
@@ -461,6 +500,59 @@ class NodeManager:
         if None not in indexlist:
             self.ManageEntriesOfCurrent(indexlist, [])
 
+    """
+    Map variables of current node into the fewest Transmit PDOs (Receive PDOs if
+    transmit is False). Variables are given by a dictionary of cycle times in ms
+    by (index, subIndex) and must be in the map variable list of the node. They
+    are removed from the PDOs already mapping them and packed by cycle time into
+    PDOs of 64 bits, reusing the PDOs having an empty mapping before adding new
+    ones. Transmit PDOs are made event driven with the cycle time as event timer
+    """
+    def PackCurrentMapVariables(self, cycletimes, transmit = True):
+        if transmit:
+            parameter, mapping = 0x1800, 0x1A00
+        else:
+            parameter, mapping = 0x1400, 0x1600
+        sizes = dict([((index, subIndex), size) for index, subIndex, size, name in self.CurrentNode.GetMapVariableList()])
+        variables = []
+        for (index, subIndex), period in cycletimes.iteritems():
+            if (index, subIndex) not in sizes:
+                return _("Variable at index 0x%04X subindex 0x%02X can't be mapped!")%(index, subIndex)
+            variables.append((index, subIndex, sizes[(index, subIndex)], period))
+        try:
+            pdos = PackMapVariables(variables)
+        except ValueError, message:
+            return str(message)
+        self.BeginCurrentTransaction()
+        try:
+            for index, subIndex, size, period in variables:
+                self.CurrentNode.RemoveMapVariable(index, subIndex)
+            for period, pdo in pdos:
+                index = mapping
+                while index < mapping + 0x200 and self.CurrentNode.IsEntry(index) and \
+                      [value for value in self.CurrentNode.GetEntry(index)[1:] if value != 0]:
+                    index += 1
+                if index == mapping + 0x200:
+                    self.CancelCurrentTransaction()
+                    return _("No PDO left for mapping variables!")
+                if not self.CurrentNode.IsEntry(index):
+                    self.ManageEntriesOfCurrent([index - mapping + parameter, index], [])
+                self.AddSubentriesToCurrent(index, len(pdo) - self.CurrentNode.GetEntry(index, 0))
+                for subIndex in xrange(1, self.CurrentNode.GetEntry(index, 0) + 1):
+                    value = 0
+                    if subIndex <= len(pdo):
+                        value = (pdo[subIndex - 1][0] << 16) + (pdo[subIndex - 1][1] << 8) + pdo[subIndex - 1][2]
+                    self.CurrentNode.SetEntry(index, subIndex, value)
+                if transmit:
+                    self.CurrentNode.SetEntry(index - mapping + parameter, 2, 0xFF)
+                    self.CurrentNode.SetEntry(index - mapping + parameter, 5, period)
+            self.BufferCurrentNode()
+        except:
+            self.CancelCurrentTransaction()
+            raise
+        self.CommitCurrentTransaction()
+        return None
+
     """
     Add a list of entries defined in profile for menu item selected to current node
     """
@@ -477,17 +569,8 @@ class NodeManager:
     Search the first index available for a pluri entry from base_index
     """
     def GetLineFromIndex(self, base_index):
-        found = False
-        index = base_index
         infos = self.GetEntryInfos(base_index)
-        while index < base_index + infos["incr"]*infos["nbmax"] and not found:
-            if not self.CurrentNode.IsEntry(index):
-                found = True
-            else:
-                index += infos["incr"]
-        if found:
-            return index
-        return None
+        return self.CurrentNode.GetFirstFreeIndex(base_index, base_index + infos["incr"] * (infos["nbmax"] - 1), infos["incr"])
     
     """
     Add entries specified in addinglist and remove entries specified in removinglist
@@ -507,24 +590,24 @@ class NodeManager:
                         default = subentry_infos["default"]
                     else:
                         default = self.GetTypeDefaultValue(subentry_infos["type"])
-                    node.AddEntry(index, value = [])
-                    if "nbmin" in subentry_infos:
-                        for i in xrange(subentry_infos["nbmin"]):
-                            node.AddEntry(index, i + 1, default)
-                    else:
-                        node.AddEntry(index, 1, default)
+                    # Subindexes are added with the entry in one operation
+                    node.AddEntry(index, value = [default] * subentry_infos.get("nbmin", 1))
                 # Second case entry is a record
                 else:
-                    i = 1
-                    subentry_infos = self.GetSubentryInfos(index, i)
+                    values = []
+                    # Type default values are only resolved once by type
+                    type_defaults = {}
+                    subentry_infos = self.GetSubentryInfos(index, 1)
                     while subentry_infos:
                         if "default" in subentry_infos:
                             default = subentry_infos["default"]
                         else:
-                            default = self.GetTypeDefaultValue(subentry_infos["type"])
-                        node.AddEntry(index, i, default)
-                        i += 1
-                        subentry_infos = self.GetSubentryInfos(index, i)
+                            if subentry_infos["type"] not in type_defaults:
+                                type_defaults[subentry_infos["type"]] = self.GetTypeDefaultValue(subentry_infos["type"])
+                            default = type_defaults[subentry_infos["type"]]
+                        values.append(default)
+                        subentry_infos = self.GetSubentryInfos(index, len(values) + 1)
+                    node.AddEntry(index, value = values)
             # Third case entry is a record
             else:
                 subentry_infos = self.GetSubentryInfos(index, 0)
@@ -593,8 +676,7 @@ class NodeManager:
             for menu,list in self.CurrentNode.GetSpecificMenu():
                 for i in list:
                     iinfos = self.GetEntryInfos(i)
-                    indexes = [i + incr * iinfos["incr"] for incr in xrange(iinfos["nbmax"])] 
-                    if index in indexes:
+                    if i <= index < i + iinfos["incr"] * iinfos["nbmax"] and (index - i) % iinfos["incr"] == 0:
                         found = True
                         diff = index - i
                         for j in list:
@@ -641,10 +723,8 @@ class NodeManager:
             return _("Index 0x%04X isn't a valid index for Map Variable!")%index
 
     def AddUserTypeToCurrent(self, type, min, max, length):
-        index = 0xA0
-        while index < 0x100 and self.CurrentNode.IsEntry(index):
-            index += 1
-        if index < 0x100:
+        index = self.CurrentNode.GetFirstFreeIndex(0xA0, 0xFF)
+        if index is not None:
             customisabletypes = self.GetCustomisableTypes()
             name, valuetype = customisabletypes[type]
             size = self.GetEntryInfos(type)["size"]
@@ -803,7 +883,55 @@ class NodeManager:
 #-------------------------------------------------------------------------------
 
     def BufferCurrentNode(self):
-        self.UndoBuffers[self.NodeIndex].Buffering(self.CurrentNode.Copy())
+        self.CurrentChanges += 1
+        # In a transaction, current node is only buffered when committed
+        if self.TransactionLevel > 0:
+            self.TransactionChanged = True
+        else:
+            self.UndoBuffers[self.NodeIndex].Buffering(self.CurrentNode.Copy())
+
+    """
+    Start a transaction on current node. Modifications made on current node
+    until the transaction is committed are stored in a single buffer state.
+    Callers must cancel the transaction if an exception is raised before it is
+    committed
+    """
+    def BeginCurrentTransaction(self):
+        # State of current node is kept for restoring it if cancelled, since
+        # modifications made before may not be buffered
+        self.TransactionStates.append(self.CurrentNode.Copy())
+        self.TransactionLevel += 1
+
+    """
+    Commit the transaction started on current node. Nested transactions are
+    only buffered when the outermost one is committed
+    """
+    def CommitCurrentTransaction(self):
+        if self.TransactionLevel > 0:
+            self.TransactionLevel -= 1
+            self.TransactionStates.pop()
+            if self.TransactionLevel == 0 and self.TransactionChanged:
+                self.TransactionChanged = False
+                self.BufferCurrentNode()
+
+    """
+    Cancel the last transaction started on current node and restore current node
+    in the state it had when the transaction started. Enclosing transactions
+    keep going
+    """
+    def CancelCurrentTransaction(self):
+        if self.TransactionLevel > 0:
+            self.TransactionLevel -= 1
+            self.CurrentNode = self.TransactionStates.pop()
+            if self.TransactionLevel == 0:
+                self.TransactionChanged = False
+
+    """
+    Return the state of the node edited, which changes each time current node is
+    modified, replaced by undo or redo or by another node
+    """
+    def GetCurrentState(self):
+        return self.CurrentNode, self.CurrentChanges
 
     def CurrentIsSaved(self):
         return self.UndoBuffers[self.NodeIndex].IsCurrentSaved()
@@ -917,13 +1045,7 @@ class NodeManager:
 
     def GetCurrentNextMapIndex(self):
         if self.CurrentNode:
-            index = 0x2000
-            while self.CurrentNode.IsEntry(index) and index < 0x5FFF:
-                index += 1
-            if index < 0x6000:
-                return index
-            else:
-                return None
+            return self.CurrentNode.GetFirstFreeIndex(0x2000, 0x5FFF)
 
     def CurrentDS302Defined(self):
         if self.CurrentNode:
@@ -1000,9 +1122,8 @@ class NodeManager:
     
     def GetCurrentValidIndexes(self, min, max):
         validindexes = []
-        for index in self.CurrentNode.GetIndexes():
-            if min <= index <= max:
-                validindexes.append((self.GetEntryName(index), index))
+        for index in self.CurrentNode.IterIndexes(min, max):
+            validindexes.append((self.GetEntryName(index), index))
         return validindexes
         
     def GetCurrentValidChoices(self, min, max):
@@ -1124,14 +1245,36 @@ class NodeManager:
 
     def AddToDCF(self, node_id, index, subindex, size, value):
         if self.CurrentNode.IsEntry(0x1F22, node_id):
-            dcf_value = self.CurrentNode.GetEntry(0x1F22, node_id)
-            if dcf_value != "":
-                nbparams = BE_to_LE(dcf_value[:4])
-            else:
-                nbparams = 0
-            new_value = LE_to_BE(nbparams + 1, 4) + dcf_value[4:]
-            new_value += LE_to_BE(index, 2) + LE_to_BE(subindex, 1) + LE_to_BE(size, 4) + LE_to_BE(value, size)
-            self.CurrentNode.SetEntry(0x1F22, node_id, new_value)
+            dcf = ConciseDCF(self.CurrentNode.GetEntry(0x1F22, node_id))
+            dcf.Append(index, subindex, size, value)
+            self.CurrentNode.SetEntry(0x1F22, node_id, dcf.GetData())
+
+    """
+    Add the parameters of several slaves to the Concise DCF of current node in a
+    single buffer state. Parameters are given in a dictionary of lists of
+    (index, subindex, size, value) by slave node id. If replace is True,
+    parameters replace the ones already defined for each slave
+    """
+    def AddListToDCF(self, parameters, replace = False):
+        self.BeginCurrentTransaction()
+        try:
+            if not self.CurrentNode.IsEntry(0x1F22):
+                self.ManageEntriesOfCurrent([0x1F22], [])
+            self.AddSubentriesToCurrent(0x1F22, 127)
+            for node_id, node_parameters in parameters.iteritems():
+                if self.CurrentNode.IsEntry(0x1F22, node_id):
+                    if replace:
+                        dcf = ConciseDCF()
+                    else:
+                        dcf = ConciseDCF(self.CurrentNode.GetEntry(0x1F22, node_id))
+                    for index, subindex, size, value in node_parameters:
+                        dcf.Append(index, subindex, size, value)
+                    self.CurrentNode.SetEntry(0x1F22, node_id, dcf.GetData())
+            self.BufferCurrentNode()
+        except:
+            self.CancelCurrentTransaction()
+            raise
+        self.CommitCurrentTransaction()
 
 #-------------------------------------------------------------------------------
 #                         Node Informations Functions
@@ -1208,3 +1351,268 @@ class NodeManager:
             return self.CurrentNode.GetSpecificMenu()
         return []
 
+
+#-------------------------------------------------------------------------------
+#                        Export of Several Nodes Functions
+#-------------------------------------------------------------------------------
+
+"""
+Export node to several files, the format of each file being given by its
+extension (.c, .eds, .ids or .par). The entries of the node are resolved once,
+unless node is already resolved, and all the files are generated from the same
+resolved node. Return the first error message encountered or None
+"""
+def ExportFiles(node, filepaths):
+    for filepath in filepaths:
+        extension = os.path.splitext(filepath)[1].lower()
+        if extension not in ExportFunctions:
+            return _("Unable to export \"%s\": unknown file format \"%s\"")%(filepath, extension)
+    if not isinstance(node, ResolvedNode):
+        node = ResolvedNode(node)
+    for filepath in filepaths:
+        result = ExportFunctions[os.path.splitext(filepath)[1].lower()](filepath, node)
+        if result is not None:
+            return result
+    return None
+
+"""
+Return the version of a file, None if it doesn't exist
+"""
+def GetFileVersion(filepath):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+"""
+Load the node defined in an od or eds file. Return the node or an error message
+"""
+def LoadNodeFile(filepath, profiles=()):
+    if os.path.splitext(filepath)[1].lower() == ".eds":
+        return eds_utils.GenerateNode(filepath)
+    manager = NodeManager()
+    result = manager.OpenFileInCurrent(filepath)
+    if isinstance(result, (StringType, UnicodeType)):
+        return result
+    node = manager.CurrentNode
+    # Profiles given are read from their file instead of the copy saved in the od file
+    profilename = node.GetProfileName()
+    try:
+        if profilename in profiles and profilename in ProfileFiles:
+            mapping, menuentries = ImportProfile(profilename, ProfileFiles[profilename])
+            node.SetProfile(mapping)
+            node.SetSpecificMenu(menuentries)
+        if "DS-302" in profiles and "DS-302" in ProfileFiles and node.GetDS302Profile():
+            node.SetDS302Profile(ImportProfile("DS-302", ProfileFiles["DS-302"])[0])
+    except Exception, message:
+        return _("Unable to load profile of \"%s\"!\n%s")%(filepath, message)
+    return node
+
+"""
+Class keeping the nodes loaded from od or eds files, resolved for export, so
+that a file not modified since it was last loaded isn't parsed again. Beyond
+size nodes, the least recently used ones are dropped
+"""
+
+class NodeFileCache:
+    
+    def __init__(self, size=16):
+        self.Size = size
+        self.Nodes = {}
+        self.Order = []
+        self.Profiles = set()
+    
+    """
+    Return the resolved node defined in the od or eds file, loading it if it
+    isn't cached or if the file was modified, or an error message
+    """
+    def GetNode(self, filepath):
+        filepath = os.path.abspath(filepath)
+        version = GetFileVersion(filepath)
+        if version is None:
+            return _("%s is not a valid file!")%filepath
+        if filepath in self.Nodes and self.Nodes[filepath][0] == version:
+            self.Order.remove(filepath)
+        else:
+            node = LoadNodeFile(filepath, self.Profiles)
+            if isinstance(node, (StringType, UnicodeType)):
+                return node
+            self.Invalidate(filepath)
+            while len(self.Order) >= self.Size:
+                self.Nodes.pop(self.Order.pop(0))
+            self.Nodes[filepath] = (version, ResolvedNode(node))
+        self.Order.append(filepath)
+        return self.Nodes[filepath][1]
+    
+    """
+    Drop the node loaded from filepath, all the nodes if filepath is None
+    """
+    def Invalidate(self, filepath=None):
+        if filepath is None:
+            self.Nodes = {}
+            self.Order = []
+        else:
+            filepath = os.path.abspath(filepath)
+            if filepath in self.Nodes:
+                self.Nodes.pop(filepath)
+                self.Order.remove(filepath)
+
+"""
+Export node to the files given with the rules of objdictgen.py: a single file is
+a C file, several files get the format given by their extension. Return the
+first error message encountered or None
+"""
+def GenerateFiles(node, filepaths):
+    if len(filepaths) == 1:
+        return ExportFunctions[".c"](filepaths[0], node)
+    return ExportFiles(node, filepaths)
+
+"""
+Export the IDS file and the parameter file of one node. Job is a tuple of the
+node, a resolved node or snapshot of it, or the path of the od or eds file
+defining it, and of the IDS and parameter file paths (None if the file isn't
+generated). Return the first error message encountered or None
+"""
+def ExportNodeFiles(job):
+    node, idsfilepath, parfilepath = job
+    if not isinstance(node, (Node, ResolvedNode)):
+        node = LoadNodeFile(node)
+        if isinstance(node, (StringType, UnicodeType)):
+            return node
+    try:
+        if idsfilepath is not None:
+            result = ids_utils.GenerateIDSFile(idsfilepath, node)
+            if result is not None:
+                return result
+        if parfilepath is not None:
+            return gen_parfile.GenerateParameterFile(parfilepath, node)
+    except IOError, message:
+        return _("Unable to export node files\n%s")%message
+    return None
+
+"""
+Export the IDS and parameter files of several nodes in parallel. Jobs are
+dispatched to a pool of processes, or of threads if threads is True, using
+processes workers (number of CPUs by default). Nodes sent to processes are
+published as snapshots so that workers only receive the path of a shared file
+instead of a copy of the node. Return the list of results of ExportNodeFiles in
+the order of jobs
+"""
+def ExportNodesFiles(jobs, processes=None, threads=False):
+    snapshots = []
+    if threads:
+        pool = ThreadPool(processes)
+    else:
+        pool = Pool(processes)
+        published = {}
+        for node, idsfilepath, parfilepath in jobs:
+            if isinstance(node, Node) and id(node) not in published:
+                published[id(node)] = NodeSnapshot(PublishNodeSnapshot(node))
+                snapshots.append(published[id(node)])
+        jobs = [(published.get(id(node), node), idsfilepath, parfilepath) for node, idsfilepath, parfilepath in jobs]
+    try:
+        return pool.map(ExportNodeFiles, jobs)
+    finally:
+        pool.close()
+        pool.join()
+        for snapshot in snapshots:
+            snapshot.Close()
+            os.remove(snapshot.FilePath)
+
+#-------------------------------------------------------------------------------
+#                          Watch of Node Files Functions
+#-------------------------------------------------------------------------------
+
+"""
+Return the paths of the files of the profiles used by node, the profile of the
+node and DS-302, whether they were loaded from their file or from an od file
+"""
+def GetProfileFiles(node):
+    filepaths = []
+    for profilename in [node.GetProfileName(), "DS-302"]:
+        if profilename in ProfileFiles:
+            filepaths.append(ProfileFiles[profilename])
+    return filepaths
+
+"""
+Class regenerating the output files of od or eds files when they or the profile
+files they use are modified. Files are polled, a change being processed once
+the file stayed unchanged for delay seconds so that a file being saved is read
+complete and only once. Nodes stay loaded between changes, and outputs are
+only rendered again if the resolved entries of the node changed or if one of
+them is missing
+"""
+
+class NodeFileWatcher:
+    
+    def __init__(self, targets, delay=0.2):
+        self.Targets = [(os.path.abspath(filepath), [os.path.abspath(output) for output in outputs]) for filepath, outputs in targets]
+        self.Delay = delay
+        self.Cache = NodeFileCache(len(self.Targets))
+        self.Versions = {}
+        self.Pending = {}
+        self.Profiles = {}
+        self.Renders = {}
+    
+    """
+    Return the paths of all the files watched
+    """
+    def GetWatchedFiles(self):
+        filepaths = set()
+        for filepath, outputs in self.Targets:
+            filepaths.add(filepath)
+            filepaths.update(self.Profiles.get(filepath, []))
+        return filepaths
+    
+    """
+    Check the watched files and return the list of the od or eds files to
+    generate again, those changed or using a profile changed
+    """
+    def Poll(self):
+        now = time.time()
+        for filepath in self.GetWatchedFiles():
+            version = GetFileVersion(filepath)
+            if version != self.Versions.get(filepath, False):
+                self.Versions[filepath] = version
+                self.Pending[filepath] = now
+        changed = set([filepath for filepath, changetime in self.Pending.iteritems() if now - changetime >= self.Delay])
+        for filepath in changed:
+            self.Pending.pop(filepath)
+        # Profiles changed are read from their file from now on, even by the
+        # od files that saved a copy of them
+        for profilename, profilepath in ProfileFiles.items():
+            if profilepath in changed:
+                self.Cache.Profiles.add(profilename)
+        filepaths = []
+        for filepath, outputs in self.Targets:
+            if filepath in changed:
+                filepaths.append(filepath)
+            elif changed.intersection(self.Profiles.get(filepath, [])):
+                # Node must be loaded again with the new profile
+                self.Cache.Invalidate(filepath)
+                filepaths.append(filepath)
+        return filepaths
+    
+    """
+    Generate the outputs of an od or eds file if needed. Return a tuple of the
+    error message or None, and of True if outputs were rendered
+    """
+    def Generate(self, filepath):
+        node = self.Cache.GetNode(filepath)
+        if isinstance(node, (StringType, UnicodeType)):
+            return node, False
+        self.Profiles[filepath] = GetProfileFiles(node)
+        # Profiles just loaded are watched from their current version
+        for profilepath in self.Profiles[filepath]:
+            if profilepath not in self.Versions:
+                self.Versions[profilepath] = GetFileVersion(profilepath)
+        outputs = dict(self.Targets)[filepath]
+        render = (node.Node, node.Records)
+        if self.Renders.get(filepath, None) == render and all(map(os.path.isfile, outputs)):
+            return None, False
+        self.Renders.pop(filepath, None)
+        result = GenerateFiles(node, outputs)
+        if result is None:
+            self.Renders[filepath] = render
+        return result, True
@@ -21,40 +21,111 @@
 #License along with this library; if not, write to the Free Software
 #Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
-import getopt,sys,os
+import getopt,sys,os,socket,time
 from types import *
 
-from nodemanager import *
-
 _ = lambda x: x
 
+# Period in seconds of the check of the files watched
+WATCH_PERIOD = 0.1
+
 def usage():
     print _("\nUsage of objdictgen.py :")
-    print "\n   %s XMLFilePath CFilePath\n"%sys.argv[0]
+    print "\n   %s XMLFilePath CFilePath"%sys.argv[0]
+    print "   %s XMLFilePath OutputFilePath [OutputFilePath ...]\n"%sys.argv[0]
+    print _("With several output files, the node is exported to each of them in the")
+    print _("format given by its extension (.c, .eds, .ids or .par).\n")
+    print _("With -s SocketPath or --server=SocketPath, the files are generated by the")
+    print _("server started by objdictgend.py on this socket, or locally if it isn't")
+    print _("running.\n")
+    print _("With -w or --watch, the input files and the profile files they use are")
+    print _("watched and the output files are generated again each time they change.")
+    print _("Several input files can be watched, separated by \":\":\n")
+    print "   %s -w XMLFilePath OutputFilePath [...] : XMLFilePath OutputFilePath [...]\n"%sys.argv[0]
 
 try:
-    opts, args = getopt.getopt(sys.argv[1:], "h", ["help"])
+    opts, args = getopt.getopt(sys.argv[1:], "hs:w", ["help", "server=", "watch"])
 except getopt.GetoptError:
     # print help information and exit:
     usage()
     sys.exit(2)
 
+server = None
+watch = False
 for o, a in opts:
     if o in ("-h", "--help"):
         usage()
         sys.exit()
+    elif o in ("-s", "--server"):
+        server = a
+    elif o in ("-w", "--watch"):
+        watch = True
+
+# Groups of an input file followed by its output files, separated by ":"
+targets = [[]]
+for arg in args:
+    if arg == ":" and watch:
+        targets.append([])
+    else:
+        targets[-1].append(arg)
 
 fileIn = ""
-fileOut = ""        
-if len(args) == 2:
-    fileIn = args[0]
-    fileOut = args[1]
+filesOut = []
+if len(targets[0]) >= 2 and min(map(len, targets)) >= 2:
+    fileIn = targets[0][0]
+    filesOut = targets[0][1:]
 else:
     usage()
     sys.exit()
 
 if __name__ == '__main__':
-    if fileIn != "" and fileOut != "":
+    if fileIn != "" and len(filesOut) > 0:
+        if watch:
+            # Error messages of the node manager are printed untranslated
+            import __builtin__
+            if "_" not in __builtin__.__dict__:
+                __builtin__.__dict__["_"] = _
+            from nodemanager import NodeFileWatcher
+            watcher = NodeFileWatcher([(target[0], target[1:]) for target in targets])
+            print _("Watching %s, press Ctrl+C to stop")%", ".join([target[0] for target in targets])
+            try:
+                while True:
+                    for filepath in watcher.Poll():
+                        start = time.time()
+                        result, rendered = watcher.Generate(filepath)
+                        if result is not None:
+                            print result
+                        elif rendered:
+                            print _("%s generated in %.3fs")%(filepath, time.time() - start)
+                        else:
+                            print _("%s unchanged, checked in %.3fs")%(filepath, time.time() - start)
+                        sys.stdout.flush()
+                    time.sleep(WATCH_PERIOD)
+            except KeyboardInterrupt:
+                pass
+            sys.exit()
+        if server is not None:
+            # Server client is only loaded when asked, Unix sockets being needed
+            from objdictgend import RequestGeneration, CheckServerSupport
+            result = CheckServerSupport()
+            if result is not None:
+                print result
+                sys.exit(-1)
+            if not os.path.isfile(fileIn):
+                print _("%s is not a valid file!")%fileIn
+                sys.exit(-1)
+            try:
+                result = RequestGeneration(fileIn, filesOut, server)
+            except socket.error, message:
+                print _("No server listening on %s, generating locally\n%s")%(server, message)
+            else:
+                if result is not None:
+                    print result
+                    sys.exit(-1)
+                print _("All done")
+                sys.exit()
+        # Node manager is only loaded when files are generated locally
+        from nodemanager import *
         manager = NodeManager()
         if os.path.isfile(fileIn):
             print _("Parsing input file")
@@ -67,8 +138,12 @@ if __name__ == '__main__':
         else:
             print _("%s is not a valid file!")%fileIn
             sys.exit(-1)
-        print _("Writing output file")
-        result = manager.ExportCurrentToCFile(fileOut)
+        if len(filesOut) == 1:
+            print _("Writing output file")
+            result = manager.ExportCurrentToCFile(filesOut[0])
+        else:
+            print _("Writing output files")
+            result = manager.ExportCurrentToFiles(filesOut)
         if isinstance(result, (UnicodeType, StringType)):
             print result
             sys.exit(-1)
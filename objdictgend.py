@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+# Only light modules are imported here, so that clients start quickly. The
+# server imports the node manager when it starts
+import getopt, sys, os, stat, errno, socket, json, time, tempfile
+import SocketServer
+from types import *
+
+_ = lambda x: x
+
+# Unix sockets only exist on some platforms, the server can't run without them
+if hasattr(SocketServer, "UnixStreamServer"):
+    UnixStreamServer = SocketServer.UnixStreamServer
+else:
+    UnixStreamServer = SocketServer.BaseServer
+
+"""
+Return an error message if the server can't be used on this platform, Unix
+sockets and user IDs being needed, None otherwise
+"""
+def CheckServerSupport():
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "getuid"):
+        return _("Generation server is not supported on this platform")
+    return None
+
+"""
+Return the directory of the socket used when none is given, private to the
+user: the runtime directory of the user if defined, otherwise a directory of
+the user created in the temporary directory
+"""
+def GetSocketDirectory():
+    return os.environ.get("XDG_RUNTIME_DIR", "") or os.path.join(tempfile.gettempdir(), "objdictgen-%d"%os.getuid())
+
+"""
+Return the path of the socket used when none is given
+"""
+def GetDefaultSocket():
+    return os.path.join(GetSocketDirectory(), "objdictgen.sock")
+
+"""
+Check that path belongs to the user and that other users have no access to it,
+so that nobody else can serve or intercept requests. Raise socket.error if not
+"""
+def CheckPrivatePath(path):
+    try:
+        stats = os.lstat(path)
+    except OSError, e:
+        raise socket.error, _("Unable to access \"%s\"\n%s")%(path, e)
+    if stats.st_uid != os.getuid():
+        raise socket.error, _("\"%s\" doesn't belong to the user")%path
+    if stat.S_ISLNK(stats.st_mode):
+        raise socket.error, _("\"%s\" is a symbolic link")%path
+    if stat.S_IMODE(stats.st_mode) & 077:
+        raise socket.error, _("\"%s\" is accessible by other users")%path
+
+"""
+Check the socket and, for the default socket, its directory before connecting
+or binding. If create is True, the default directory is created if missing.
+Raise socket.error if the platform doesn't support the server
+"""
+def CheckSocket(socketpath, create = False):
+    result = CheckServerSupport()
+    if result is not None:
+        raise socket.error, result
+    directory = GetSocketDirectory()
+    if os.path.dirname(os.path.abspath(socketpath)) == os.path.abspath(directory):
+        if create:
+            try:
+                os.mkdir(directory, 0700)
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise socket.error, _("Unable to create \"%s\"\n%s")%(directory, e)
+        CheckPrivatePath(directory)
+    if os.path.lexists(socketpath) or not create:
+        CheckPrivatePath(socketpath)
+        if not stat.S_ISSOCK(os.lstat(socketpath).st_mode):
+            raise socket.error, _("\"%s\" is not a socket")%socketpath
+
+#-------------------------------------------------------------------------------
+#                                 Client Side
+#-------------------------------------------------------------------------------
+
+"""
+Send a request to the server listening on socketpath, the default socket if
+None, and return its response.
+Requests and responses are JSON objects written on one line, one request by
+connection. Raise socket.error if no server is listening or if the socket isn't
+private to the user
+"""
+def SendRequest(request, socketpath = None):
+    if socketpath is None:
+        socketpath = GetDefaultSocket()
+    CheckSocket(socketpath)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socketpath)
+        stream = client.makefile("rwb")
+        stream.write(json.dumps(request) + "\n")
+        stream.flush()
+        line = stream.readline()
+        stream.close()
+    finally:
+        client.close()
+    if not line:
+        raise socket.error, _("Connection closed by server")
+    return json.loads(line)
+
+"""
+Ask the server listening on socketpath to generate the outputs of an od or eds
+file, with the same rules as objdictgen.py: a single output is a C file, several
+outputs get the format given by their extension. Paths are made absolute since
+the server doesn't share the working directory of the client. Return an error
+message or None, raise socket.error if no server is listening
+"""
+def RequestGeneration(filepath, outputs, socketpath = None):
+    response = SendRequest({"command" : "generate",
+                            "input" : os.path.abspath(filepath),
+                            "outputs" : [os.path.abspath(output) for output in outputs]},
+                           socketpath)
+    return response.get("error", None)
+
+#-------------------------------------------------------------------------------
+#                                 Server Side
+#-------------------------------------------------------------------------------
+
+"""
+Class handling a connection: read one request and write its response
+"""
+
+class GenerationRequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            response = self.server.ProcessRequest(request)
+        except ValueError:
+            response = {"error" : _("Invalid request")}
+        except Exception, e:
+            response = {"error" : _("Unable to process request\n%s")%e}
+        self.wfile.write(json.dumps(response) + "\n")
+
+"""
+Class of the server keeping the node manager, the profiles and the recently used
+nodes loaded between requests. Requests are processed one at a time. Commands
+are:
+  - "generate": generate the "outputs" of the od or eds file "input"
+  - "ping": check that the server is alive
+  - "stop": stop the server after responding
+Responses contain an "error" message if the request failed and the "time"
+spent processing it in seconds
+"""
+
+class GenerationServer(UnixStreamServer):
+
+    def __init__(self, socketpath = None, cachesize = 16):
+        if socketpath is None:
+            socketpath = GetDefaultSocket()
+        CheckSocket(socketpath, True)
+        import nodemanager
+        self.Manager = nodemanager
+        self.Cache = nodemanager.NodeFileCache(cachesize)
+        self.Running = False
+        self.SocketPath = socketpath
+        # Remove the socket left by a server that didn't stop properly
+        if os.path.lexists(socketpath):
+            try:
+                SendRequest({"command" : "ping"}, socketpath)
+            except socket.error:
+                os.remove(socketpath)
+            else:
+                raise socket.error, _("A server is already listening on \"%s\"")%socketpath
+        # Socket is only accessible by the user running the server
+        mask = os.umask(0177)
+        try:
+            UnixStreamServer.__init__(self, socketpath, GenerationRequestHandler)
+        finally:
+            os.umask(mask)
+
+    """
+    Process a request and return its response
+    """
+    def ProcessRequest(self, request):
+        start = time.time()
+        command = request.get("command", None)
+        if command == "generate":
+            result = self.Generate(request.get("input", ""), request.get("outputs", []))
+        elif command == "ping":
+            result = None
+        elif command == "stop":
+            self.Running = False
+            result = None
+        else:
+            result = _("Unknown command \"%s\"")%command
+        response = {"time" : time.time() - start}
+        if result is not None:
+            response["error"] = result
+        return response
+
+    """
+    Generate the outputs of an od or eds file from the cached node
+    """
+    def Generate(self, filepath, outputs):
+        if len(outputs) == 0:
+            return _("No output file given")
+        node = self.Cache.GetNode(filepath)
+        if isinstance(node, (StringType, UnicodeType)):
+            return node
+        return self.Manager.GenerateFiles(node, outputs)
+
+    """
+    Process requests until a stop request is received
+    """
+    def Serve(self):
+        self.Running = True
+        try:
+            while self.Running:
+                self.handle_request()
+        finally:
+            self.server_close()
+            if os.path.exists(self.SocketPath):
+                os.remove(self.SocketPath)
+
+def usage():
+    print _("\nUsage of objdictgend.py :")
+    print "\n   %s [-s SocketPath] [--stop]\n"%sys.argv[0]
+    print _("Start a server generating the files of objdictgen.py requested by")
+    print _("\"objdictgen.py --server=SocketPath\", or stop it with --stop.")
+    if CheckServerSupport() is None:
+        print _("Default socket is %s, in a directory only accessible by the user.")%GetDefaultSocket()
+    print _("Sockets not belonging to the user or accessible by others are refused.\n")
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hs:", ["help", "socket=", "stop"])
+    except getopt.GetoptError:
+        # print help information and exit:
+        usage()
+        sys.exit(2)
+
+    socketpath = None
+    stop = False
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit()
+        elif o in ("-s", "--socket"):
+            socketpath = a
+        elif o == "--stop":
+            stop = True
+
+    result = CheckServerSupport()
+    if result is not None:
+        print result
+        sys.exit(-1)
+
+    if stop:
+        try:
+            SendRequest({"command" : "stop"}, socketpath)
+        except socket.error, message:
+            print _("No server listening on %s\n%s")%(socketpath or GetDefaultSocket(), message)
+            sys.exit(-1)
+    else:
+        # Error messages of the node manager are returned untranslated
+        import __builtin__
+        if "_" not in __builtin__.__dict__:
+            __builtin__.__dict__["_"] = _
+        try:
+            server = GenerationServer(socketpath)
+        except socket.error, message:
+            print message
+            sys.exit(-1)
+        print _("Listening on %s")%server.SocketPath
+        server.Serve()
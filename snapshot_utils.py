@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack. 
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+
+from types import ListType
+import os, mmap, marshal, struct, bisect, tempfile
+
+from node import DefaultParams, MappingDictionary
+
+# Header of a snapshot file: magic, version, number of entry records, offset
+# and length of the node record
+SNAPSHOT_MAGIC = "CFNS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER_FORMAT = "<4sHIII"
+SNAPSHOT_HEADER_SIZE = struct.calcsize(SNAPSHOT_HEADER_FORMAT)
+# Entry of the record table: index, 1 if the entry is defined in the Object
+# Dictionary and 0 if only its type informations are recorded, offset and
+# length of the entry record
+SNAPSHOT_RECORD_FORMAT = "<HBII"
+SNAPSHOT_RECORD_SIZE = struct.calcsize(SNAPSHOT_RECORD_FORMAT)
+
+#-------------------------------------------------------------------------------
+#                             Resolution of a Node
+#-------------------------------------------------------------------------------
+
+"""
+Return the params of a subentry to store in a snapshot, None for default ones
+"""
+def GetSnapshotParams(params):
+    if params == DefaultParams:
+        return None
+    return dict(params)
+
+"""
+Return the record of an entry of node, with its informations, names, values
+and params resolved. Only informations and names are recorded for the entries
+that aren't defined in the Object Dictionary
+"""
+def GetEntryRecord(node, index):
+    record = {"infos" : node.GetEntryInfos(index),
+              "name" : node.GetEntryName(index),
+              "rawname" : node.GetEntryName(index, False),
+              "base" : node.GetBaseIndex(index)}
+    if node.IsEntry(index):
+        record["callbacks"] = node.HasEntryCallbacks(index)
+        values = node.GetEntry(index, compute = False)
+        computed = node.GetEntry(index)
+        record["values"] = values
+        if computed != values:
+            record["computed"] = computed
+        params = node.GetParamsEntry(index)
+        if type(values) == ListType:
+            # Informations of subindex 1 are needed even if a list is empty
+            subindexes = range(max(len(values), 2))
+            record["params"] = [GetSnapshotParams(subparams) for subparams in params]
+        else:
+            subindexes = [0]
+            record["params"] = GetSnapshotParams(params)
+        record["subinfos"] = [node.GetSubentryInfos(index, subIndex) for subIndex in subindexes]
+        record["subrawnames"] = [(infos or {}).get("name") for infos in [node.GetSubentryInfos(index, subIndex, False) for subIndex in subindexes]]
+    return record
+
+"""
+Return the record of the informations of node and of the types it knows
+"""
+def GetNodeRecord(node):
+    return {"name" : node.GetNodeName(),
+            "id" : node.GetNodeID(),
+            "type" : node.GetNodeType(),
+            "description" : node.GetNodeDescription(),
+            "profilename" : node.GetProfileName(),
+            "defaultstringsize" : node.GetDefaultStringSize(),
+            "types" : node.GetTypeRegistry(),
+            "stringtypes" : [index for index in xrange(0x100) if node.IsStringType(index)],
+            "realtypes" : [index for index in xrange(0x100) if node.IsRealType(index)]}
+
+"""
+Return the indexes for which node records are built: the entries of the Object
+Dictionary and, for their informations, the types and the entries defined in
+mappings
+"""
+def GetResolvedIndexes(node):
+    indexes = set(node.GetIndexes())
+    for mapping in [MappingDictionary] + node.GetMappings():
+        indexes.update([index for index in mapping if node.GetEntryInfos(index) is not None])
+    return sorted(indexes)
+
+#-------------------------------------------------------------------------------
+#                            Publish a Node Snapshot
+#-------------------------------------------------------------------------------
+
+"""
+Write the snapshot of node, or of a node already resolved, in filepath, a
+temporary file if None, and return its path. The snapshot holds all the records
+of the resolved node, so that it can be read without the profile mappings.
+"""
+def PublishNodeSnapshot(node, filepath = None):
+    if not isinstance(node, ResolvedNode):
+        node = ResolvedNode(node)
+    if filepath is None:
+        handle, filepath = tempfile.mkstemp(suffix = ".snapshot")
+        os.close(handle)
+    noderecord = marshal.dumps(node.Node)
+    records = [(index, "values" in record, marshal.dumps(record)) for index, record in sorted(node.Records.iteritems())]
+    offset = SNAPSHOT_HEADER_SIZE + SNAPSHOT_RECORD_SIZE * len(records)
+    snapshot = open(filepath, "wb")
+    try:
+        snapshot.write(struct.pack(SNAPSHOT_HEADER_FORMAT, SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+            len(records), offset + sum([len(data) for index, defined, data in records]), len(noderecord)))
+        for index, defined, data in records:
+            snapshot.write(struct.pack(SNAPSHOT_RECORD_FORMAT, index, defined, offset, len(data)))
+            offset += len(data)
+        for index, defined, data in records:
+            snapshot.write(data)
+        snapshot.write(noderecord)
+    finally:
+        snapshot.close()
+    return filepath
+
+#-------------------------------------------------------------------------------
+#                          Definition of Resolved Node
+#-------------------------------------------------------------------------------
+
+"""
+Class giving a read-only view of a node whose entries were all resolved in a
+single pass: informations, names, values and params of every subindex are
+computed once and kept in one record by entry. It answers the requests made to
+a node by the exporters (gen_cfile, eds_utils, ids_utils and gen_parfile), so
+that several exports of a node share the same resolution.
+"""
+
+class ResolvedNode:
+    
+    def __init__(self, node):
+        self.Node = GetNodeRecord(node)
+        self.Records = dict([(index, GetEntryRecord(node, index)) for index in GetResolvedIndexes(node)])
+        self.Indexes = [index for index in sorted(self.Records.keys()) if "values" in self.Records[index]]
+    
+    """
+    Return the record of an entry, None if there is no record for index
+    """
+    def GetRecord(self, index):
+        return self.Records.get(index, None)
+    
+    def GetNodeName(self):
+        return self.Node["name"]
+    
+    def GetNodeID(self):
+        return self.Node["id"]
+    
+    def GetNodeType(self):
+        return self.Node["type"]
+    
+    def GetNodeDescription(self):
+        return self.Node["description"]
+    
+    def GetProfileName(self):
+        return self.Node["profilename"]
+    
+    def GetDefaultStringSize(self):
+        return self.Node["defaultstringsize"]
+
+#-------------------------------------------------------------------------------
+#                            Entry Access Functions
+#-------------------------------------------------------------------------------
+
+    def GetIndexes(self):
+        return self.Indexes[:]
+    
+    def IterIndexes(self, min = 0, max = 0xFFFF):
+        return iter(self.Indexes[bisect.bisect_left(self.Indexes, min):bisect.bisect_right(self.Indexes, max)])
+    
+    def IsEntry(self, index, subIndex = None):
+        record = self.GetRecord(index)
+        if record is not None and "values" in record:
+            if not subIndex:
+                return True
+            return type(record["values"]) == ListType and subIndex < len(record["values"])
+        return False
+    
+    def GetEntry(self, index, subIndex = None, compute = True):
+        record = self.GetRecord(index)
+        if record is None or "values" not in record:
+            return None
+        if compute:
+            values = record.get("computed", record["values"])
+        else:
+            values = record["values"]
+        if type(values) == ListType:
+            if subIndex == None:
+                return values[:]
+            elif 0 <= subIndex < len(values):
+                return values[subIndex]
+            return None
+        elif not subIndex:
+            return values
+        return None
+    
+    def GetParamsEntry(self, index, subIndex = None):
+        record = self.GetRecord(index)
+        if record is None or "values" not in record:
+            return None
+        params = record["params"]
+        if type(params) == ListType:
+            if subIndex == None:
+                return [subparams or DefaultParams for subparams in params]
+            elif 0 <= subIndex < len(params):
+                return params[subIndex] or DefaultParams
+            return None
+        elif not subIndex:
+            return params or DefaultParams
+        return None
+    
+    def IterEntryValues(self, index, compute = True):
+        values = self.GetEntry(index, compute = compute)
+        params = self.GetParamsEntry(index)
+        if type(values) == ListType:
+            for subIndex, value in enumerate(values):
+                yield subIndex, value, params[subIndex]
+        elif values is not None:
+            yield 0, values, params
+
+#-------------------------------------------------------------------------------
+#                         Node Informations Functions
+#-------------------------------------------------------------------------------
+
+    def GetBaseIndex(self, index):
+        record = self.GetRecord(index)
+        if record is None:
+            return 0
+        return record["base"]
+    
+    def GetEntryName(self, index, compute = True):
+        record = self.GetRecord(index)
+        if record is None:
+            return None
+        if compute:
+            return record["name"]
+        return record["rawname"]
+    
+    def GetEntryInfos(self, index, compute = True):
+        record = self.GetRecord(index)
+        if record is None or record["infos"] is None:
+            return None
+        infos = record["infos"].copy()
+        if not compute:
+            infos["name"] = record["rawname"]
+        return infos
+    
+    def GetSubentryInfos(self, index, subIndex, compute = True):
+        record = self.GetRecord(index)
+        if record is None or "subinfos" not in record:
+            return None
+        subinfos = record["subinfos"]
+        if 0 <= subIndex < len(subinfos):
+            if subinfos[subIndex] is None:
+                return None
+            infos = subinfos[subIndex].copy()
+            if not compute:
+                infos["name"] = record["subrawnames"][subIndex]
+            return infos
+        return None
+    
+    def HasEntryCallbacks(self, index):
+        record = self.GetRecord(index)
+        if record is None:
+            return False
+        return record.get("callbacks", False)
+
+#-------------------------------------------------------------------------------
+#                            Type helper functions
+#-------------------------------------------------------------------------------
+
+    def GetTypeIndex(self, typename):
+        return self.Node["types"]["index"].get(typename, None)
+    
+    def GetTypeName(self, typeindex):
+        return self.Node["types"]["name"].get(typeindex, None)
+    
+    def GetTypeDefaultValue(self, typeindex):
+        return self.Node["types"]["default"].get(typeindex, None)
+    
+    def GetTypeList(self):
+        return self.Node["types"]["list"]
+    
+    def IsStringType(self, index):
+        return index in self.Node["stringtypes"]
+    
+    def IsRealType(self, index):
+        return index in self.Node["realtypes"]
+
+#-------------------------------------------------------------------------------
+#                          Definition of Node Snapshot
+#-------------------------------------------------------------------------------
+
+"""
+Class giving a read-only view of a node snapshot file published by
+PublishNodeSnapshot. The file is mapped in memory and shared by all the
+processes attached to it: only the record table is read when attaching, each
+entry record being decoded on first access. Pickling a snapshot only transmits
+its path, so that worker processes attach to the same file instead of
+receiving a copy of the node.
+"""
+
+class NodeSnapshot(ResolvedNode):
+    
+    def __init__(self, filepath):
+        self.Attach(filepath)
+    
+    def __getstate__(self):
+        return {"FilePath" : self.FilePath}
+    
+    def __setstate__(self, state):
+        self.Attach(state["FilePath"])
+    
+    """
+    Map the snapshot file in memory and read its record table
+    """
+    def Attach(self, filepath):
+        self.FilePath = filepath
+        snapshot = open(filepath, "rb")
+        try:
+            self.Buffer = mmap.mmap(snapshot.fileno(), 0, access = mmap.ACCESS_READ)
+        finally:
+            snapshot.close()
+        magic, version, count, offset, length = struct.unpack_from(SNAPSHOT_HEADER_FORMAT, self.Buffer, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            self.Buffer.close()
+            raise ValueError, _("\"%s\" isn't a valid node snapshot")%filepath
+        self.Indexes = []
+        self.Offsets = {}
+        for i in xrange(count):
+            index, defined, record_offset, record_length = struct.unpack_from(SNAPSHOT_RECORD_FORMAT, self.Buffer, SNAPSHOT_HEADER_SIZE + i * SNAPSHOT_RECORD_SIZE)
+            if defined:
+                self.Indexes.append(index)
+            self.Offsets[index] = (record_offset, record_length)
+        self.Records = {}
+        self.Node = marshal.loads(self.Buffer[offset:offset + length])
+    
+    """
+    Release the memory mapping of the snapshot file
+    """
+    def Close(self):
+        self.Buffer.close()
+    
+    """
+    Return the record of an entry, decoded on first access, None if the
+    snapshot has no record for index
+    """
+    def GetRecord(self, index):
+        if index not in self.Records:
+            if index not in self.Offsets:
+                return None
+            offset, length = self.Offsets[index]
+            self.Records[index] = marshal.loads(self.Buffer[offset:offset + length])
+        return self.Records[index]
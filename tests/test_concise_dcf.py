@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, struct, unittest
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from node import ConciseDCF, EncodeDCFValue, DecodeDCFValue
+
+PARAMETERS = [(0x1017, 0, 2, 1000), (0x1800, 1, 4, 0x80000181), (0x1A00, 0, 1, 0),
+              (0x2000, 0, 3, 0x123456), (0x2001, 0, 8, 0x0102030405060708), (0x2002, 0, 0, 0)]
+
+"""
+Test that Concise DCF values and parameters are the same once encoded and decoded
+"""
+
+class ConciseDCFTest(unittest.TestCase):
+
+    def testValues(self):
+        self.assertEqual(EncodeDCFValue(0x1234, 2), "\x34\x12")
+        self.assertEqual(EncodeDCFValue(0x123456, 3), "\x56\x34\x12")
+        self.assertEqual(EncodeDCFValue(-1, 4), "\xff\xff\xff\xff")
+        self.assertEqual(EncodeDCFValue(0, 0), "")
+        for size in xrange(0, 9):
+            value = 0x0102030405060708 & ((1 << (size * 8)) - 1)
+            data = EncodeDCFValue(value, size)
+            self.assertEqual(len(data), size)
+            self.assertEqual(DecodeDCFValue(data), value)
+
+    def testData(self):
+        dcf = ConciseDCF()
+        self.assertEqual(dcf.GetData(), "")
+        dcf.Append(0x1017, 0, 2, 1000)
+        dcf.Append(0x2000, 0, 3, 0x123456)
+        self.assertEqual(dcf.GetData(), struct.pack("<I", 2) +
+                         struct.pack("<HBI", 0x1017, 0, 2) + "\xe8\x03" +
+                         struct.pack("<HBI", 0x2000, 0, 3) + "\x56\x34\x12")
+
+    def testRoundTrip(self):
+        dcf = ConciseDCF()
+        for parameter in PARAMETERS:
+            dcf.Append(*parameter)
+        self.assertEqual(len(dcf), len(PARAMETERS))
+        self.assertEqual(dcf.GetParameters(), PARAMETERS)
+        decoded = ConciseDCF(dcf.GetData())
+        self.assertEqual(len(decoded), len(PARAMETERS))
+        self.assertEqual(decoded.GetParameters(), PARAMETERS)
+        self.assertEqual(decoded.GetData(), dcf.GetData())
+
+    def testAppendAfterDecoding(self):
+        dcf = ConciseDCF()
+        dcf.SetParameters(PARAMETERS[:2])
+        decoded = ConciseDCF(dcf.GetData())
+        decoded.GetParameters()
+        for parameter in PARAMETERS[2:]:
+            decoded.Append(*parameter)
+        self.assertEqual(decoded.GetParameters(), PARAMETERS)
+        self.assertEqual(ConciseDCF(decoded.GetData()).GetParameters(), PARAMETERS)
+        decoded.SetParameters([])
+        self.assertEqual(decoded.GetData(), "")
+
+if __name__ == '__main__':
+    unittest.main()
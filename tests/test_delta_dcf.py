@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, shutil, tempfile, unittest
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager
+from nodelist import NodeList, ComputeSlaveDeltaDCF, OrderDCFParameters
+from node import ConciseDCF
+
+"""
+Test that delta Concise DCFs keep only the last value of the parameters differing
+from the EDS ones and the whole reconfiguration sequence of the PDOs in order
+"""
+
+class DeltaDCFTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.Root, "eds"))
+        slave = NodeManager()
+        slave.CreateNewNode("slave", 1, "slave", "", "None", "", "Heartbeat", [])
+        slave.ExportCurrentToEDSFile(os.path.join(self.Root, "eds", "slave.eds"))
+        self.Manager = NodeManager()
+        self.NodeList = NodeList(self.Manager)
+        self.assertEqual(self.NodeList.LoadProject(self.Root), None)
+        self.NodeList.AddSlaveNode("slave", 2, "slave.eds")
+        self.Slave = self.NodeList.SlaveNodes[2]["Node"]
+
+    def tearDown(self):
+        shutil.rmtree(self.Root)
+
+    def GetConfiguration(self):
+        # Remap the first TPDO of the slave on its heartbeat producer time
+        return [(0x1017, 0, 100), (0x1800, 1, 0x80000182), (0x1A00, 0, 0), (0x1A00, 1, 0x10170010),
+                (0x1A00, 0, 1), (0x1800, 1, 0x182), (0x1017, 0, 200), (0x1017, 0, 0)]
+
+    def testOrderParameters(self):
+        parameters = [(0x2000, 0, 1, 1), (0x1800, 1, 4, 0x80000182), (0x1017, 0, 2, 100),
+                      (0x1A00, 0, 1, 0), (0x2000, 0, 1, 2), (0x1800, 1, 4, 0x182)]
+        self.assertEqual(OrderDCFParameters(parameters),
+                         [(0x1017, 0, 2, 100), (0x2000, 0, 1, 2),
+                          (0x1800, 1, 4, 0x80000182), (0x1A00, 0, 1, 0), (0x1800, 1, 4, 0x182)])
+
+    def testPDOSequence(self):
+        nodeid, (delta, saved_bytes, saved_transactions) = ComputeSlaveDeltaDCF((2, self.Slave, self.GetConfiguration()))
+        self.assertEqual(nodeid, 2)
+        # Heartbeat producer time is set back to the EDS value, PDO writes are all kept
+        self.assertEqual(delta, [(0x1800, 1, 4, 0x80000182), (0x1A00, 0, 1, 0), (0x1A00, 1, 4, 0x10170010),
+                                 (0x1A00, 0, 1, 1), (0x1800, 1, 4, 0x182)])
+        self.assertEqual(saved_bytes, 3 * (7 + 2))
+        self.assertEqual(saved_transactions, 3)
+
+    def testOptimizeMasterDCF(self):
+        self.assertEqual(self.NodeList.OptimizeMasterDCF({2 : self.GetConfiguration()}), {2 : (27, 3)})
+        dcf = ConciseDCF(self.Manager.CurrentNode.GetEntry(0x1F22, 2))
+        self.assertEqual([parameter[:2] for parameter in dcf.GetParameters()],
+                         [(0x1800, 1), (0x1A00, 0), (0x1A00, 1), (0x1A00, 0), (0x1800, 1)])
+        # Slave node shared by the project isn't modified
+        self.assertEqual(self.Slave.GetEntry(0x1A00, 0), 8)
+        self.assertNotEqual(self.NodeList.OptimizeMasterDCF({3 : []}), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, random, unittest
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from node import Node
+
+RANGES = [(0x2000, 0x2040, 1), (0x1600, 0x17FF, 4), (0xA0, 0xA8, 1)]
+
+"""
+Return the first free index of a range by checking all its indexes
+"""
+def FindFirstFreeIndex(node, first, last, incr):
+    for index in xrange(first, last + 1, incr):
+        if index not in node.Dictionary:
+            return index
+    return None
+
+"""
+Test that free indexes found from the heaps kept by the node are the ones found
+by checking every index, through additions, removals, relocations and copies
+"""
+
+class FreeIndexesTest(unittest.TestCase):
+
+    def testFirstFreeIndex(self):
+        node = Node()
+        self.assertEqual(node.GetFirstFreeIndex(0x2000, 0x2002), 0x2000)
+        for index in [0x2000, 0x2001, 0x2002]:
+            node.AddEntry(index, value = 0)
+        self.assertEqual(node.GetFirstFreeIndex(0x2000, 0x2002), None)
+        node.RemoveEntry(0x2001)
+        self.assertEqual(node.GetFirstFreeIndex(0x2000, 0x2002), 0x2001)
+
+    def testCopyKeepsFreeIndexes(self):
+        node = Node()
+        for index in xrange(0x2000, 0x2010):
+            node.AddEntry(index, value = 0)
+        self.assertEqual(node.GetFirstFreeIndex(0x2000, 0x5FFF), 0x2010)
+        copied = node.Copy()
+        self.assertEqual(copied.FreeIndexes, node.FreeIndexes)
+        copied.RemoveEntry(0x2004)
+        self.assertEqual(copied.GetFirstFreeIndex(0x2000, 0x5FFF), 0x2004)
+        self.assertEqual(node.GetFirstFreeIndex(0x2000, 0x5FFF), 0x2010)
+
+    def testRandomOperations(self):
+        generator = random.Random(3)
+        node = Node()
+        for step in xrange(5000):
+            first, last, incr = generator.choice(RANGES)
+            choice = generator.random()
+            if choice < 0.45:
+                index = node.GetFirstFreeIndex(first, last, incr)
+                self.assertEqual(index, FindFirstFreeIndex(node, first, last, incr))
+                if index is not None:
+                    node.AddEntry(index, value = 0)
+            elif choice < 0.6:
+                index = generator.randrange(first, last + 1)
+                if index not in node.Dictionary:
+                    node.AddEntry(index, value = 0)
+            elif choice < 0.9:
+                if node.Dictionary:
+                    node.RemoveEntry(generator.choice(node.Dictionary.keys()))
+            elif choice < 0.95:
+                node = node.Copy()
+            elif not [index for index in xrange(0x2011, 0x2021) if index in node.Dictionary]:
+                node.RelocateEntries(0x2000, 0x2010, 0x10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, unittest
+import xml.etree.ElementTree as ET
+import xml.dom.minidom as minidom
+from types import ListType
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager, var
+import ids_utils
+
+NAMESPACE = "{http://www.inovel.de/XMLSchema}"
+
+"""
+Return the IDS content of node as generated before the streaming writer: the
+document is built with ElementTree and pretty printed by minidom
+"""
+def GenerateReference(node):
+    ET.register_namespace("ino", NAMESPACE[1:-1])
+    root = ET.Element(NAMESPACE + "IDS")
+    device = ET.SubElement(root, NAMESPACE + "Device")
+    sections = [ET.SubElement(device, NAMESPACE + "CommunicationParameter"),
+                ET.SubElement(device, NAMESPACE + "ProcessParameter")]
+    for index in node.GetIndexes():
+        if 0x1000 <= index <= 0x1029:
+            section, save = sections[0], False
+        elif 0x2000 <= index <= 0x5FFF:
+            section, save = sections[1], True
+        else:
+            continue
+        values = node.GetEntry(index, compute = False)
+        subindexes = [0]
+        if type(values) == ListType:
+            subindexes = range(len(values))
+        for subindex in subindexes:
+            infos = node.GetSubentryInfos(index, subindex)
+            params = node.GetParamsEntry(index, subindex)
+            if save and not params["save"] or infos.get("name", "Compatibility Entry") == "Compatibility Entry":
+                continue
+            typeinfos = node.GetEntryInfos(infos["type"])
+            item = ET.SubElement(section, NAMESPACE + "ParameterItem")
+            for name, value in [("Index", "0x%.4X"%index), ("Subindex", "0x%.2X"%subindex),
+                                ("Authority", infos["access"].upper()), ("Security", infos["access"].upper()),
+                                ("Description", infos["name"]), ("Comment", params.get("comment", ""))]:
+                ET.SubElement(item, NAMESPACE + name).text = value
+            datatype = ET.SubElement(item, NAMESPACE + "DataType")
+            ET.SubElement(datatype, NAMESPACE + "Length").text = "%d"%(typeinfos["size"] / 8)
+            ET.SubElement(datatype, NAMESPACE + "Type").text = "%d"%ids_utils.GetTypeNumber(node.GetTypeName(infos["type"]))
+    return minidom.parseString(ET.tostring(root, encoding="UTF-8", method="xml")).toprettyxml(indent="\t")
+
+"""
+Test that IDS files are the same as the ones generated before the streaming
+writer, including comments with special characters and line ends
+"""
+
+class IDSExportTest(unittest.TestCase):
+
+    def setUp(self):
+        manager = NodeManager()
+        manager.CreateNewNode("slave", 1, "slave", "", "None", "", "Heartbeat", [])
+        manager.AddMapVariableToCurrent(0x2000, "variable", var, 1)
+        self.Node = manager.CurrentNode
+
+    def CheckReference(self):
+        content = ids_utils.GenerateFileContent(self.Node, "")
+        self.assertEqual(content, GenerateReference(self.Node).encode("utf-8"))
+        return content
+
+    def testReference(self):
+        self.CheckReference()
+
+    def testCommentLineEnds(self):
+        self.Node.SetParamsEntry(0x1018, 1, comment = "cr\r\nlf")
+        self.Node.SetParamsEntry(0x1017, 0, comment = "a\rb\n\rc")
+        content = self.CheckReference()
+        self.assertTrue("<ino:Comment>cr\nlf</ino:Comment>" in content)
+        self.assertFalse("\r" in content)
+
+    def testCommentCharacters(self):
+        self.Node.SetParamsEntry(0x1018, 1, comment = "a & <b> \"q\" 'r'\t")
+        self.Node.SetParamsEntry(0x2000, 0, comment = u"caf\xe9", save = True)
+        self.CheckReference()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, random, unittest
+from types import ListType
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager
+
+VARIABLES = [(0x2000, 0), (0x2001, 0), (0x2002, 1), (0x2002, 2)]
+
+"""
+Return the slots mapping each variable by checking all the PDO mapping entries
+"""
+def FindMapSlots(node):
+    slots = {}
+    for index, values in node.Dictionary.iteritems():
+        if (0x1600 <= index <= 0x17FF or 0x1A00 <= index <= 0x1BFF) and type(values) == ListType:
+            for subIndex, value in enumerate(values):
+                if value != 0:
+                    slots.setdefault((value >> 16, (value >> 8) & 0xFF), set()).add((index, subIndex + 1))
+    return slots
+
+"""
+Test that the reverse index of mapped variables gives the slots found by
+checking every mapping entry, through additions, removals and relocations
+"""
+
+class MapReverseIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Manager = NodeManager()
+        self.Manager.CreateNewNode("slave", 1, "slave", "", "None", "", "Heartbeat", [])
+
+    def CheckReverseIndex(self):
+        node = self.Manager.CurrentNode
+        expected = FindMapSlots(node)
+        reverse = {}
+        for index, subindexes in node.GetMapReverseIndex().iteritems():
+            for subIndex, slots in subindexes.iteritems():
+                if slots:
+                    reverse[(index, subIndex)] = slots
+        self.assertEqual(reverse, expected)
+        for (index, subIndex), slots in expected.iteritems():
+            self.assertTrue(set(node.GetMapSlots(index, subIndex or None)) >= slots)
+
+    def testMapSlots(self):
+        node = self.Manager.CurrentNode
+        node.SetEntry(0x1A00, 1, 0x20000008)
+        node.SetEntry(0x1A01, 2, 0x20000008)
+        node.SetEntry(0x1600, 1, 0x20020108)
+        self.assertEqual(sorted(node.GetMapSlots(0x2000)), [(0x1A00, 1), (0x1A01, 2)])
+        self.assertEqual(node.GetMapSlots(0x2002, 1), [(0x1600, 1)])
+        node.UpdateMapVariable(0x2000, 0, 16)
+        self.assertEqual(node.GetEntry(0x1A01, 2), 0x20000010)
+        node.RemoveMapVariable(0x2000)
+        self.assertEqual(node.GetMapSlots(0x2000), [])
+        self.assertEqual(node.GetEntry(0x1A00, 1), 0)
+        self.CheckReverseIndex()
+
+    def testRemovePDO(self):
+        node = self.Manager.CurrentNode
+        node.SetEntry(0x1A02, 1, 0x20000008)
+        node.SetEntry(0x1A03, 1, 0x20010008)
+        self.Manager.BufferCurrentNode()
+        self.CheckReverseIndex()
+        # Following PDOs are moved to fill the gap left by the PDO removed
+        self.Manager.RemoveCurrentVariable(0x1802)
+        self.Manager.BufferCurrentNode()
+        self.assertEqual(self.Manager.CurrentNode.GetMapSlots(0x2000), [])
+        self.assertEqual(self.Manager.CurrentNode.GetMapSlots(0x2001), [(0x1A02, 1)])
+        self.CheckReverseIndex()
+        self.Manager.LoadCurrentPrevious()
+        self.assertEqual(self.Manager.CurrentNode.GetMapSlots(0x2001), [(0x1A03, 1)])
+        self.CheckReverseIndex()
+
+    def testRandomOperations(self):
+        generator = random.Random(5)
+        for step in xrange(2000):
+            node = self.Manager.CurrentNode
+            mappings = [index for index in node.GetIndexes() if 0x1600 <= index <= 0x17FF or 0x1A00 <= index <= 0x1BFF]
+            choice = generator.random()
+            if choice < 0.4 and mappings:
+                index = generator.choice(mappings)
+                if not node.Dictionary[index]:
+                    continue
+                subIndex = generator.randint(1, len(node.Dictionary[index]))
+                variable, subvariable = generator.choice(VARIABLES)
+                value = generator.choice([0, (variable << 16) + (subvariable << 8) + 8])
+                node.SetEntry(index, subIndex, value)
+            elif choice < 0.5 and mappings:
+                index = generator.choice(mappings)
+                if generator.random() < 0.5:
+                    node.AddEntry(index, len(node.Dictionary[index]) + 1, 0x20010008)
+                elif len(node.Dictionary[index]) > 1:
+                    node.RemoveEntry(index, len(node.Dictionary[index]))
+            elif choice < 0.6:
+                node.RemoveMapVariable(*generator.choice(VARIABLES))
+            elif choice < 0.7:
+                variable, subvariable = generator.choice(VARIABLES)
+                node.UpdateMapVariable(variable, subvariable, 16)
+            elif choice < 0.8:
+                self.Manager.AddPDOTransmitToCurrent()
+            elif choice < 0.9 and mappings:
+                self.Manager.RemoveCurrentVariable(generator.choice(mappings) - 0x200)
+            elif choice < 0.95:
+                self.Manager.CurrentNode = node.Copy()
+            else:
+                self.Manager.LoadCurrentPrevious()
+            self.CheckReverseIndex()
+
+if __name__ == '__main__':
+    unittest.main()
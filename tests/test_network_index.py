@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, shutil, tempfile, unittest
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager
+from nodelist import NodeList
+import eds_utils
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config")
+
+"""
+Test that the network index and its analysis follow the modifications made on
+the master through the node manager, including undo and redo
+"""
+
+class NetworkIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.Root, "eds"))
+        slave = NodeManager()
+        slave.CreateNewNode("slave", 1, "slave", "", "DS-401", os.path.join(CONFIG, "DS-401.prf"), "Heartbeat", [])
+        slave.ExportCurrentToEDSFile(os.path.join(self.Root, "eds", "slave.eds"))
+        self.Manager = NodeManager()
+        self.NodeList = NodeList(self.Manager)
+        self.assertEqual(self.NodeList.LoadProject(self.Root), None)
+        self.NodeList.AddSlaveNode("slave", 1, "slave.eds")
+
+    def tearDown(self):
+        shutil.rmtree(self.Root)
+
+    def GetProducerProblems(self):
+        return [problem for problem in self.NodeList.AnalyzeNetwork() if "produced by node" in problem]
+
+    def testMasterEditUndoRedo(self):
+        self.assertEqual(self.GetProducerProblems(), [])
+        # Master transmits on the COB-ID of the first TPDO of the slave
+        self.Manager.AddPDOTransmitToCurrent()
+        self.Manager.SetCurrentEntry(0x1800, 1, "0x181", "value", None)
+        users = self.NodeList.GetNetworkIndex().GetCOBIDUsers(0x181)
+        self.assertEqual(sorted([(nodeid, index) for nodeid, index, subindex, role in users]), [(0, 0x1800), (1, 0x1800)])
+        self.assertEqual(len(self.GetProducerProblems()), 1)
+        self.Manager.LoadCurrentPrevious()
+        self.assertEqual(self.GetProducerProblems(), [])
+        self.Manager.LoadCurrentNext()
+        self.assertEqual(len(self.GetProducerProblems()), 1)
+
+    def testUnconfiguredSYNC(self):
+        self.Manager.ManageEntriesOfCurrent([0x1005], [])
+        self.Manager.SetCurrentEntry(0x1005, 0, "0", "value", None)
+        self.assertEqual(self.NodeList.GetNetworkIndex().GetCOBIDUsers(0), [])
+
+if __name__ == '__main__':
+    unittest.main()
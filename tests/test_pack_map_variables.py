@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, unittest
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager, var
+from node import PackMapVariables
+
+"""
+Test the packing of map variables into the fewest PDOs by cycle time
+"""
+
+class PackMapVariablesTest(unittest.TestCase):
+
+    def testFirstFitDecreasing(self):
+        variables = [(0x2000, 0, 8, 10), (0x2001, 0, 32, 10), (0x2002, 0, 16, 10),
+                     (0x2003, 0, 32, 10), (0x2004, 0, 8, 10), (0x2005, 0, 16, 10)]
+        pdos = PackMapVariables(variables)
+        # Biggest variables are placed first, smaller ones fill the PDOs left
+        self.assertEqual(pdos, [(10, [(0x2001, 0, 32), (0x2003, 0, 32)]),
+                                (10, [(0x2002, 0, 16), (0x2005, 0, 16), (0x2000, 0, 8), (0x2004, 0, 8)])])
+
+    def testFewestPDOs(self):
+        # 3 variables of 40 bits and 3 of 24 bits fit in 3 PDOs of 64 bits
+        variables = [(0x2000 + i, 0, [40, 24][i % 2], 100) for i in xrange(6)]
+        pdos = PackMapVariables(variables)
+        self.assertEqual(len(pdos), 3)
+        for period, pdo in pdos:
+            self.assertEqual(sum([size for index, subIndex, size in pdo]), 64)
+
+    def testGroupedByCycleTime(self):
+        variables = [(0x2000, 0, 8, 100), (0x2001, 0, 8, 10), (0x2002, 0, 8, 100), (0x2003, 0, 8, 10)]
+        pdos = PackMapVariables(variables)
+        self.assertEqual(pdos, [(10, [(0x2001, 0, 8), (0x2003, 0, 8)]),
+                                (100, [(0x2000, 0, 8), (0x2002, 0, 8)])])
+
+    def testMaxBits(self):
+        variables = [(0x2000, 0, 8, 10), (0x2001, 0, 8, 10)]
+        self.assertEqual(len(PackMapVariables(variables, 8)), 2)
+        self.assertEqual(PackMapVariables([(0x2000, 0, 64, 10)]), [(10, [(0x2000, 0, 64)])])
+
+    def testVariableTooWide(self):
+        self.assertRaises(ValueError, PackMapVariables, [(0x2000, 0, 8, 10), (0x2001, 0, 80, 10)])
+        self.assertRaises(ValueError, PackMapVariables, [(0x2000, 0, 16, 10)], 8)
+
+    def testPackCurrentMapVariables(self):
+        manager = NodeManager()
+        manager.CreateNewNode("slave", 1, "slave", "", "None", "", "Heartbeat", [])
+        for i in xrange(3):
+            manager.AddMapVariableToCurrent(0x2000 + i, "v%d"%i, var, 0)
+        cycletimes = {(0x2000, 0) : 10, (0x2001, 0) : 10, (0x2002, 0) : 20}
+        node = manager.CurrentNode
+        # Packing again removes variables from the PDOs already mapping them
+        for i in xrange(2):
+            self.assertEqual(manager.PackCurrentMapVariables(cycletimes), None)
+            self.assertEqual(node.GetEntry(0x1A00), [8, 0x20000008, 0x20010008, 0, 0, 0, 0, 0, 0])
+            self.assertEqual(node.GetEntry(0x1800, 5), 10)
+            self.assertEqual(node.GetEntry(0x1A01), [8, 0x20020008, 0, 0, 0, 0, 0, 0, 0])
+            self.assertEqual(node.GetEntry(0x1801, 5), 20)
+            self.assertEqual(node.GetEntry(0x1A02, 1), 0)
+        self.assertEqual(manager.TransactionLevel, 0)
+        self.assertNotEqual(manager.PackCurrentMapVariables({(0x2005, 0) : 10}), None)
+        self.assertEqual(manager.TransactionLevel, 0)
+
+if __name__ == '__main__':
+    unittest.main()
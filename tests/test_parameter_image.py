@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, shutil, struct, tempfile, unittest, zlib
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager, var
+import gen_parfile
+
+HEADER_SIZE = struct.calcsize(gen_parfile.PARAMETER_IMAGE_HEADER)
+
+"""
+Test the layout and the content of binary parameter images
+"""
+
+class ParameterImageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Manager = NodeManager()
+        self.Manager.CreateNewNode("slave", 1, "slave", "", "None", "", "Heartbeat", [])
+        self.Manager.CurrentNode.SetDefaultStringSize(4)
+        self.AddParameter(0x2000, "BOOLEAN", True)
+        self.AddParameter(0x2001, "VISIBLE_STRING", "ab")
+        self.AddParameter(0x2002, "VISIBLE_STRING", "a" * 14)
+        self.AddParameter(0x2003, "VISIBLE_STRING", u"caf\xe9")
+        self.AddParameter(0x2004, "UNICODE_STRING", u"h\xe9")
+        self.AddParameter(0x2005, "DOMAIN", "\x01\x02\x03")
+        self.Root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Root)
+
+    def AddParameter(self, index, typename, value):
+        self.Manager.AddMapVariableToCurrent(index, "p%X"%index, var, 0)
+        self.Manager.SetCurrentEntry(index, 0, typename, "type", "type")
+        self.Manager.CurrentNode.SetEntry(index, 0, value)
+        self.Manager.SetCurrentEntry(index, 0, "Yes", "save", "option")
+
+    def GetImage(self, alignment = 1):
+        node = self.Manager.CurrentNode
+        layout = gen_parfile.GenerateLayout(node, alignment, True)
+        return layout, gen_parfile.GenerateImageContent(node, layout, alignment)
+
+    def GetSlots(self, layout, content):
+        data = content[HEADER_SIZE:]
+        return dict([(index, data[offset:offset + size]) for index, subindex, offset, size, typeindex in layout])
+
+    def testHeader(self):
+        layout, content = self.GetImage(2)
+        magic, version, alignment, count, size, crc = struct.unpack(gen_parfile.PARAMETER_IMAGE_HEADER, content[:HEADER_SIZE])
+        data = content[HEADER_SIZE:]
+        self.assertEqual(magic, "CFPI")
+        self.assertEqual(version, gen_parfile.PARAMETER_IMAGE_VERSION)
+        self.assertEqual(alignment, 2)
+        self.assertEqual(count, len(layout))
+        self.assertEqual(size, len(data))
+        self.assertEqual(crc, zlib.crc32(data) & 0xFFFFFFFF)
+
+    def testSlots(self):
+        slots = self.GetSlots(*self.GetImage())
+        self.assertEqual(slots[0x2000], "\x01")
+        # Strings take the default string size or the length of their value
+        self.assertEqual(slots[0x2001], "ab\x00\x00")
+        self.assertEqual(slots[0x2002], "a" * 14)
+        self.assertEqual(slots[0x2003], u"caf\xe9".encode("utf-8"))
+        self.assertEqual(slots[0x2004], u"h\xe9".encode("utf-16-le") + "\x00" * 4)
+        self.assertEqual(slots[0x2005], "\x01\x02\x03")
+
+    def testAlignment(self):
+        layout, content = self.GetImage(4)
+        for index, subindex, offset, size, typeindex in layout:
+            self.assertEqual(offset % 4, 0)
+        self.assertEqual(len(content) - HEADER_SIZE, gen_parfile.AlignOffset(layout[-1][2] + layout[-1][3], 4))
+
+    def testEmptyDomain(self):
+        filepath = os.path.join(self.Root, "node.img")
+        self.assertEqual(self.Manager.ExportCurrentToParameterImage(filepath), None)
+        previous = open(filepath, "rb").read()
+        self.Manager.CurrentNode.SetEntry(0x2005, 0, "")
+        self.assertNotEqual(self.Manager.ExportCurrentToParameterImage(filepath), None)
+        # Image is written atomically, previous one is kept
+        self.assertEqual(open(filepath, "rb").read(), previous)
+        self.assertEqual(os.listdir(self.Root), ["node.img"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, unittest
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager
+from node import Node
+
+"""
+Test that removing an entry from a line moves the following entries as a block,
+with their params and user mappings, and drops the entry removed
+"""
+
+class RemoveLineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Node = Node()
+        for i in xrange(4):
+            index = 0x2000 + i
+            self.Node.AddMappingEntry(index, name = "line%d"%i, struct = 1)
+            self.Node.AddMappingEntry(index, 0, values = {"name" : "line%d"%i, "type" : 0x07, "access" : "rw", "pdo" : True})
+            self.Node.AddEntry(index, value = 0x100 + i)
+            self.Node.SetParamsEntry(index, None, comment = "comment%d"%i)
+
+    def testRemoveLine(self):
+        self.Node.RemoveLine(0x2001, 0x2003)
+        self.assertEqual(self.Node.GetIndexes(), [0x2000, 0x2001, 0x2002])
+        for index, i in [(0x2000, 0), (0x2001, 2), (0x2002, 3)]:
+            self.assertEqual(self.Node.GetEntry(index), 0x100 + i)
+            self.assertEqual(self.Node.GetParamsEntry(index)["comment"], "comment%d"%i)
+            self.assertEqual(self.Node.UserMapping[index]["name"], "line%d"%i)
+        self.assertFalse(0x2003 in self.Node.Dictionary)
+        self.assertFalse(0x2003 in self.Node.ParamsDictionary)
+        self.assertFalse(0x2003 in self.Node.UserMapping)
+        # Params of the entry removed don't remain anywhere
+        comments = [params.get("comment", None) for params in self.Node.ParamsDictionary.values()]
+        self.assertFalse("comment1" in comments)
+        self.assertEqual(self.Node.GetFirstFreeIndex(0x2000, 0x2003), 0x2003)
+
+    def testRemoveLastOfLine(self):
+        self.Node.RemoveLine(0x2003, 0x2003)
+        self.assertEqual(self.Node.GetIndexes(), [0x2000, 0x2001, 0x2002])
+        self.assertFalse(0x2003 in self.Node.ParamsDictionary)
+        self.assertFalse(0x2003 in self.Node.UserMapping)
+
+    def testRelocateEntries(self):
+        self.Node.RelocateEntries(0x2002, 0x2003, 0x10)
+        self.assertEqual(self.Node.GetIndexes(), [0x2000, 0x2001, 0x2012, 0x2013])
+        self.assertEqual(self.Node.GetEntry(0x2012), 0x102)
+        self.assertEqual(self.Node.GetParamsEntry(0x2013)["comment"], "comment3")
+        self.assertEqual(self.Node.UserMapping[0x2013]["name"], "line3")
+        self.assertEqual(self.Node.GetFirstFreeIndex(0x2000, 0x2013), 0x2002)
+
+    def testRemovePDO(self):
+        manager = NodeManager()
+        manager.CreateNewNode("slave", 1, "slave", "", "None", "", "Heartbeat", [])
+        # Slave has 4 receive PDOs
+        node = manager.CurrentNode
+        node.SetEntry(0x1402, 1, 0x402)
+        node.SetEntry(0x1602, 1, 0x20000108)
+        node.SetParamsEntry(0x1602, 1, comment = "mapping")
+        manager.RemoveCurrentVariable(0x1401)
+        # Communication and mapping parameters move together
+        self.assertFalse(node.IsEntry(0x1403))
+        self.assertFalse(node.IsEntry(0x1603))
+        self.assertEqual(node.GetEntry(0x1401, 1), 0x402)
+        self.assertEqual(node.GetEntry(0x1601, 1), 0x20000108)
+        self.assertEqual(node.GetParamsEntry(0x1601, 1)["comment"], "mapping")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, unittest
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager
+from node import SlaveView
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config")
+
+"""
+Test that the views of the slaves sharing a node never modify it nor see the
+values of each other
+"""
+
+class SlaveViewTest(unittest.TestCase):
+
+    def setUp(self):
+        manager = NodeManager()
+        manager.CreateNewNode("slave", 1, "slave", "", "DS-401", os.path.join(CONFIG, "DS-401.prf"), "Heartbeat", [])
+        self.Node = manager.CurrentNode
+        self.First = SlaveView(self.Node, 2)
+        self.Second = SlaveView(self.Node, 3)
+
+    def testOverrides(self):
+        self.assertTrue(self.First.SetEntry(0x1800, 1, 0x999))
+        self.assertEqual(self.First.GetEntry(0x1800, 1), 0x999)
+        self.assertEqual(self.Second.GetEntry(0x1800, 1), 0x183)
+        self.assertEqual(self.Node.GetEntry(0x1800, 1), 0x181)
+        self.First.ResetEntry(0x1800)
+        self.assertEqual(self.First.GetEntry(0x1800, 1), 0x182)
+
+    def testPrintString(self):
+        self.First.SetEntry(0x1800, 1, 0x999)
+        self.assertTrue("1800 01 (COB ID used by PDO): 999\n" in self.First.PrintString())
+        self.assertFalse("1800 01 (COB ID used by PDO): 999\n" in self.Second.PrintString())
+
+    def testMutatorsRefused(self):
+        for name in ["AddEntry", "RemoveEntry", "SetParamsEntry", "AddMappingEntry",
+                     "SetMappingEntry", "RemoveMappingEntry", "SetNodeName"]:
+            self.assertRaises(TypeError, getattr, self.First, name)
+        self.assertFalse(hasattr(self.First, "Unknown"))
+
+if __name__ == '__main__':
+    unittest.main()
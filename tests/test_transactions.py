@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import os, sys, unittest
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import NodeManager
+
+"""
+Test that the modifications made in a transaction are buffered as a single undo
+state when committed, and that cancelled transactions restore the node
+"""
+
+class TransactionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Manager = NodeManager()
+        self.Manager.CreateNewNode("master", 0, "master", "", "None", "", "Heartbeat", [])
+        self.Buffer = self.Manager.UndoBuffers[self.Manager.GetCurrentNodeIndex()]
+
+    def SetHeartbeat(self, value):
+        self.Manager.SetCurrentEntry(0x1017, 0, str(value), "value", None)
+
+    def GetHeartbeat(self):
+        return self.Manager.GetCurrentEntry(0x1017, 0)
+
+    def testCommitSingleUndoStep(self):
+        self.Manager.BeginCurrentTransaction()
+        self.SetHeartbeat(100)
+        self.SetHeartbeat(200)
+        self.Manager.CommitCurrentTransaction()
+        self.assertEqual(self.Manager.TransactionLevel, 0)
+        self.assertEqual(self.GetHeartbeat(), 200)
+        self.Manager.LoadCurrentPrevious()
+        self.assertEqual(self.GetHeartbeat(), 0)
+        self.Manager.LoadCurrentNext()
+        self.assertEqual(self.GetHeartbeat(), 200)
+        self.assertTrue(self.Buffer.IsLast())
+
+    def testNestedTransactions(self):
+        self.Manager.BeginCurrentTransaction()
+        self.SetHeartbeat(100)
+        self.Manager.BeginCurrentTransaction()
+        self.SetHeartbeat(200)
+        self.Manager.CancelCurrentTransaction()
+        self.assertEqual(self.Manager.TransactionLevel, 1)
+        self.assertEqual(self.GetHeartbeat(), 100)
+        self.Manager.BeginCurrentTransaction()
+        self.SetHeartbeat(300)
+        self.Manager.CommitCurrentTransaction()
+        # Nested transaction is only buffered with the outermost one
+        self.Manager.CommitCurrentTransaction()
+        self.assertEqual(self.GetHeartbeat(), 300)
+        self.Manager.LoadCurrentPrevious()
+        self.assertEqual(self.GetHeartbeat(), 0)
+
+    def testCancelKeepsUnbufferedModifications(self):
+        self.Manager.CurrentNode.SetEntry(0x1017, 0, 50)
+        self.Manager.BeginCurrentTransaction()
+        self.SetHeartbeat(100)
+        self.Manager.CancelCurrentTransaction()
+        self.assertEqual(self.Manager.TransactionLevel, 0)
+        self.assertEqual(self.GetHeartbeat(), 50)
+
+    def testCancelOnError(self):
+        self.assertRaises(TypeError, self.Manager.AddListToDCF, {2 : [(0x1017, 0, 2, "bad")]})
+        self.assertEqual(self.Manager.TransactionLevel, 0)
+        self.assertEqual(self.Manager.TransactionStates, [])
+        self.assertFalse(self.Manager.CurrentNode.IsEntry(0x1F22))
+        # Undo buffering works again after the error
+        self.SetHeartbeat(100)
+        self.Manager.LoadCurrentPrevious()
+        self.assertEqual(self.GetHeartbeat(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#This file is part of CanFestival, a library implementing CanOpen Stack.
+#
+#Copyright (C): Edouard TISSERANT, Francis DUPIN and Laurent BESSARD
+#
+#See COPYING file for copyrights details.
+#
+#This library is free software; you can redistribute it and/or
+#modify it under the terms of the GNU Lesser General Public
+#License as published by the Free Software Foundation; either
+#version 2.1 of the License, or (at your option) any later version.
+#
+#This library is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#Lesser General Public License for more details.
+#
+#You should have received a copy of the GNU Lesser General Public
+#License along with this library; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+# Benchmark of Node.Copy against a deep copy and a pickle round-trip of a big
+# node, checking that the copy is independent of the node copied
+
+import os, sys, time, copy, cPickle
+import __builtin__
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if "_" not in __builtin__.__dict__:
+    __builtin__.__dict__["_"] = lambda x: x
+
+from nodemanager import *
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config")
+
+"""
+Return a DS-401 slave with DS-302, pdos receive and transmit PDOs and variables
+map variables
+"""
+def BuildNode(pdos = 200, variables = 1000):
+    manager = NodeManager()
+    manager.CreateNewNode("big", 5, "slave", "", "DS-401", os.path.join(CONFIG, "DS-401.prf"), "Heartbeat", ["DS302"])
+    manager.BeginCurrentTransaction()
+    for i in xrange(pdos):
+        manager.AddPDOTransmitToCurrent()
+        manager.AddPDOReceiveToCurrent()
+    for i in xrange(variables):
+        index = manager.GetCurrentNextMapIndex()
+        manager.AddMapVariableToCurrent(index, "v%d"%i, [var, array, rec][i % 3], 10)
+        manager.SetCurrentEntry(index, 0, "c", "comment", "string")
+    manager.CommitCurrentTransaction()
+    return manager.CurrentNode
+
+"""
+Return the mean time in ms of count calls of function
+"""
+def Measure(function, count = 20):
+    start = time.time()
+    for i in xrange(count):
+        function()
+    return (time.time() - start) / count * 1000
+
+if __name__ == '__main__':
+    node = BuildNode()
+    print "%d indexes"%len(node.Dictionary)
+    copied = node.Copy()
+    copied.Dictionary[0x1A00][0] = 99
+    copied.ParamsDictionary[0x2000]["comment"] = "z"
+    copied.UserMapping[0x2000]["values"][0]["name"] = "q"
+    assert node.Dictionary[0x1A00][0] != 99
+    assert node.ParamsDictionary[0x2000]["comment"] == "c"
+    assert node.UserMapping[0x2000]["values"][0]["name"] != "q"
+    reference = Measure(node.Copy)
+    for name, function in [("copy.deepcopy(node)", lambda: copy.deepcopy(node)),
+                           ("cPickle round-trip", lambda: cPickle.loads(cPickle.dumps(node, 2)))]:
+        elapsed = Measure(function)
+        print "%-22s %8.2f ms"%(name, elapsed)
+    print "%-22s %8.2f ms"%("node.Copy()", reference)